@@ -0,0 +1,40 @@
+# 对比字节扫描和 BeautifulSoup 两种方式提取 pageData 的耗时
+# 用法：python -m benchmarks.bench_extract [保存的搜索页.html ...]
+import sys
+import timeit
+
+from benchmarks.fakejd import make_search_page
+from net import extract_page_data, extract_page_data_soup
+
+
+def fixtures(paths):
+    if paths:
+        for path in paths:
+            with open(path, 'rb') as f:
+                yield path, f.read()
+        return
+    for filler in (200, 2000, 20000):
+        page = make_search_page('手机', filler=filler)
+        yield f'synthetic filler={filler}', page.encode('utf-8')
+
+
+def bench(func, *args):
+    timer = timeit.Timer(lambda: func(*args))
+    number, _ = timer.autorange()
+    return min(timer.repeat(3, number)) / number
+
+
+def main():
+    for name, content in fixtures(sys.argv[1:]):
+        text = content.decode('utf-8')
+        assert extract_page_data(content) == extract_page_data_soup(text)
+        fast = bench(extract_page_data, content)
+        soup = bench(extract_page_data_soup, text)
+        print(f'{name} ({len(content) // 1024} KiB): '
+              f'scan {fast * 1000:.3f} ms, '
+              f'BeautifulSoup {soup * 1000:.3f} ms, '
+              f'{soup / fast:.0f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+# 对比每张图片单独建立客户端与共享连接池的下载吞吐
+# 用法：python -m benchmarks.bench_fetch [图片数量]
+import asyncio
+import sys
+import time
+
+import httpx
+
+from benchmarks.fakejd import FakeJD
+from net import Fetcher
+
+
+async def per_request_client(urls):
+    async def fetch(url):
+        async with httpx.AsyncClient() as client:
+            response = await client.get(url)
+            return response.content
+
+    return await asyncio.gather(*(fetch(url) for url in urls),
+                                return_exceptions=True)
+
+
+async def pooled_client(urls):
+    async with Fetcher() as fetcher:
+        return await asyncio.gather(*(fetcher.get(url) for url in urls),
+                                    return_exceptions=True)
+
+
+def bench(name, func, urls):
+    start = time.perf_counter()
+    results = asyncio.run(func(urls))
+    elapsed = time.perf_counter() - start
+    failed = sum(isinstance(result, Exception) for result in results)
+    print(f'{name:<20} {len(urls)} 张 {elapsed:.3f}s '
+          f'{len(urls) / elapsed:.1f} 张/s 失败 {failed}')
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    with FakeJD() as server:
+        urls = [f'{server.url}/n1/jfs/t1/{i}.jpg' for i in range(count)]
+        baseline = bench('per-request client', per_request_client, urls)
+        pooled = bench('pooled client', pooled_client, urls)
+    print(f'speedup: {baseline / pooled:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
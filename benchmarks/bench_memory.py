@@ -0,0 +1,96 @@
+# 商品目录的内存占用：每件商品一个对象 + OrderedIndex + 集合倒排索引（旧的表示），
+# 与按列存放的 Catalog + 数组倒排索引比较，同时比较常用查询的耗时
+# 用法：python -m benchmarks.bench_memory [商品数量 ...]
+import gc
+import sys
+import time
+import tracemalloc
+
+from benchmarks.suite import make_products
+from catalog import Catalog
+from index import OrderedIndex
+from models import product_key
+from search import CatalogIndex, tokenize
+
+
+class DictProduct:
+    # 加 __slots__ 之前的商品对象
+    def __init__(self, name, price, image_key=None, id=None, sku=None):
+        self.id = id
+        self.name = name
+        self.price = price
+        self.image_key = image_key
+        self.sku = sku
+
+
+def build_objects(rows):
+    products = OrderedIndex(lambda product: product.id)
+    product_keys = {}
+    postings, tokens, prices = {}, {}, {}
+    for row in rows:
+        product = DictProduct(row[1], row[2], row[3], row[0], row[4])
+        products.add(product)
+        product_keys.setdefault(
+            product_key(product.name, product.price, product.sku), []
+        ).append(product.id)
+        tokens[product.id] = set(tokenize(product.name, unigrams=True))
+        for token in tokens[product.id]:
+            postings.setdefault(token, set()).add(product.id)
+        prices[product.id] = product.price
+    by_price = sorted((price, id) for id, price in prices.items())
+    return products, product_keys, postings, tokens, prices, by_price
+
+
+def build_columns(rows):
+    catalog = Catalog()
+    key_counts = {}
+    for row in rows:
+        key = product_key(row[1], row[2], row[4])
+        key_counts[key] = key_counts.get(key, 0) + 1
+    catalog.extend(rows)
+    index = CatalogIndex(catalog)
+    index.add_all()
+    return catalog, key_counts, index
+
+
+def measure(build, rows):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build(rows)
+    elapsed = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size, elapsed
+
+
+def query_time(func, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2]
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+    for count in counts:
+        rows = [(id, p.name, p.price, f'{id:040x}', p.sku)
+                for id, p in enumerate(make_products(count), 1)]
+        objects, old_size, old_build = measure(build_objects, rows)
+        del objects
+        (catalog, _, index), new_size, new_build = measure(build_columns, rows)
+        price = query_time(lambda: index.search('', 10000, 20000))
+        ranked = query_time(lambda: index.search('手机 耳机'))
+        by_price = query_time(lambda: index.search('手机', sort='-price'))
+        scan = query_time(lambda: sum(p.price for p in catalog[:1000]))
+        print(f'{count:>7} 件商品: 对象 {old_size / 2**20:.1f} MB '
+              f'({old_build:.2f} s) -> 按列 {new_size / 2**20:.1f} MB '
+              f'({new_build:.2f} s)；查询：价格区间 {price * 1000:.2f} ms，'
+              f'关键字 {ranked * 1000:.2f} ms，按价格排序 {by_price * 1000:.2f} ms，'
+              f'读取 1000 行 {scan * 1000:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# “经常一起购买”：在合成的订单上计时共现统计和整表重建，并测量查询耗时。
+# 商品热度服从长尾分布，另外埋入固定搭配（商品 i 与 i + BUNDLES），
+# 检查它们能否出现在彼此的推荐中
+# 用法：python -m benchmarks.bench_recommend [订单明细行数]
+import os
+import random
+import sys
+import tempfile
+import time
+from itertools import accumulate
+
+from models import Product
+from recommend import TOP_K, co_occurrence, rebuild
+from store import Store
+
+PRODUCTS = 50000
+BUNDLES = 1000  # 固定搭配的数量
+LOOKUP_BUDGET = 0.001  # 秒，一次推荐查询的上限
+
+
+def make_baskets(line_items, seed=0):
+    rng = random.Random(seed)
+    ids = range(1, PRODUCTS + 1)
+    weights = list(accumulate(1 / rank for rank in ids))
+    baskets = []
+    total = 0
+    while total < line_items:
+        basket = set(rng.choices(ids, cum_weights=weights,
+                                 k=rng.randint(1, 7)))
+        if rng.random() < 0.3:
+            first = rng.randint(1, BUNDLES)
+            basket.update((first, first + BUNDLES))
+        baskets.append(list(basket))
+        total += len(basket)
+    return baskets, total
+
+
+def write_orders(store, baskets):
+    with store.conn:
+        store.conn.executemany(
+            'INSERT INTO orders (id, username, created, total) '
+            'VALUES (?, ?, 0, 0)',
+            ((order_id, 'bench') for order_id in range(1, len(baskets) + 1)))
+        store.conn.executemany(
+            'INSERT INTO order_items (order_id, product_id, name, price, '
+            'quantity) VALUES (?, ?, ?, 100, 1)',
+            ((order_id, product_id, '')
+             for order_id, basket in enumerate(baskets, 1)
+             for product_id in basket))
+
+
+def main():
+    line_items = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    baskets, total = make_baskets(line_items)
+    print(f'{len(baskets)} 个订单，{total} 行明细，{PRODUCTS} 件商品')
+
+    start = time.perf_counter()
+    neighbors = co_occurrence(baskets)
+    build = time.perf_counter() - start
+    found = sum(any(neighbor == first + BUNDLES
+                    for _, neighbor in neighbors.get(first, ()))
+                for first in range(1, BUNDLES + 1))
+    print(f'共现统计和 top-{TOP_K}：{build:.2f} s，'
+          f'{len(neighbors)} 件商品有推荐，固定搭配命中 {found}/{BUNDLES}')
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.db')
+        store = Store(path)
+        store.add_products(Product(f'商品 {i}', 100, sku=str(i))
+                           for i in range(1, PRODUCTS + 1))
+        write_orders(store, baskets)
+        start = time.perf_counter()
+        rebuild(path)
+        full = time.perf_counter() - start
+        print(f'从数据库整表重建：{full:.2f} s')
+
+        rng = random.Random(1)
+        products = [store.get_product(rng.randint(1, BUNDLES))
+                    for _ in range(10000)]
+        times = []
+        for product in products:
+            start = time.perf_counter()
+            store.co_purchases(product)
+            times.append(time.perf_counter() - start)
+        store.close()
+    times.sort()
+    p50, p99 = times[len(times) // 2], times[len(times) * 99 // 100]
+    ok = p99 <= LOOKUP_BUDGET
+    print(f'查询：p50 {p50 * 1e6:.0f} µs，p99 {p99 * 1e6:.0f} µs '
+          f'{"OK" if ok else "超出预算"}')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,83 @@
+# 冷启动耗时：在新进程中从导入 main 到登录窗口可用所需的时间，
+# 以及商品目录在后台载入完成的时间；登录耗时不应随商品数量增长
+# 用法：python -m benchmarks.bench_startup [商品数量 ...]
+import os
+import subprocess
+import sys
+import tempfile
+
+from models import product_key
+from store import Store
+
+BUDGET = 0.5  # 秒，登录窗口可用的时间上限
+HEAVY_MODULES = ('httpx', 'bs4', 'tqdm', 'PIL', 'asyncio')
+
+CHILD = f'''
+import os
+import sys
+import time
+
+start = time.perf_counter()
+import main
+store = main.open_store()
+if os.environ.get('DISPLAY'):
+    app = main.ShoppingSystem()
+    app.update()
+    store = app.store
+login = time.perf_counter() - start
+heavy = [name for name in {HEAVY_MODULES!r} if name in sys.modules]
+store.preload_catalog()
+store.ensure_catalog()
+catalog = time.perf_counter() - start
+print(login, catalog, len(store.products), ','.join(heavy) or '-')
+'''
+
+
+def make_data(path, count):
+    store = Store(path)
+    rows = []
+    for i in range(count):
+        name = f'测试商品 {i} 型号 X{i % 97} 轻薄 笔记本'
+        price = i % 5000 * 100 + 99  # 分
+        rows.append((name, price, None, str(i), product_key(name, price, str(i))))
+    with store.conn:
+        store.conn.executemany(
+            'INSERT INTO products (name, price, image_key, sku, key) '
+            'VALUES (?, ?, ?, ?, ?)', rows)
+        store.conn.executemany(
+            'INSERT INTO users (username, password, role) VALUES (?, ?, ?)',
+            [('admin', 'admin', 'admin')] +
+            [(f'user{i}', 'x', 'user') for i in range(count // 100)])
+    store.close()
+
+
+def run(directory):
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD], cwd=directory, env=env,
+        capture_output=True, text=True, check=True).stdout
+    login, catalog, products, heavy = output.split()
+    return float(login), float(catalog), int(products), heavy
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [0, 1000, 10000, 100000]
+    if not os.environ.get('DISPLAY'):
+        print('没有 DISPLAY，只测量导入和打开数据库，不创建窗口')
+    failed = False
+    for count in counts:
+        with tempfile.TemporaryDirectory() as directory:
+            make_data(os.path.join(directory, 'data.db'), count)
+            login, catalog, products, heavy = min(
+                run(directory) for _ in range(3))
+        ok = login <= BUDGET
+        failed |= not ok
+        print(f'{count:>7} 件商品: 登录可用 {login * 1000:.0f} ms '
+              f'{"OK" if ok else "超出预算"}, '
+              f'目录载入 {catalog * 1000:.0f} ms ({products} 件), '
+              f'已导入的重模块 {heavy}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
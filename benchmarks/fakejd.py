@@ -0,0 +1,145 @@
+# 本地模拟的 re.jd.com 搜索页和图片 CDN，供基准测试使用
+import json
+import random
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import parse_qs, urlparse
+
+from PIL import Image
+
+PER_PAGE = 30
+
+_jpeg_cache = {}
+
+
+def make_jpeg(seed, size=(350, 350)):
+    # 同一个 seed 每次运行都得到相同的图片；噪声也由 rng 生成
+    key = (seed % 16, size)
+    if key not in _jpeg_cache:
+        rng = random.Random(key[0])
+        image = Image.new('RGB', size, tuple(rng.randrange(256) for _ in range(3)))
+        noise = Image.frombytes(
+            'L', size, rng.randbytes(size[0] * size[1])).convert('RGB')
+        image = Image.blend(image, noise, 0.5)
+        buffer = BytesIO()
+        image.save(buffer, format='JPEG', quality=85)
+        _jpeg_cache[key] = buffer.getvalue()
+    return _jpeg_cache[key]
+
+
+def make_items(keyword, page=1, per_page=PER_PAGE):
+    rng = random.Random(f'{keyword}:{page}')
+    items = []
+    for i in range(per_page):
+        sku = rng.randrange(10 ** 8, 10 ** 9)
+        item = {
+            'sku_id': str(sku),
+            'ad_title_text': f'{keyword} 测试商品 {page}-{i} 型号{sku % 1000}',
+            'image_url': f'jfs/t1/{sku}/{rng.randrange(16)}.jpg',
+            'ad_title': f'{keyword} {sku}',
+        }
+        if i % 3:
+            item['price'] = f'{rng.randrange(100, 1000000) / 100:.2f}'
+        else:
+            item['sku_price'] = f'{rng.randrange(100, 1000000) / 100:.2f}'
+        items.append(item)
+    return items
+
+
+def make_search_page(keyword, page=1, per_page=PER_PAGE, filler=2000):
+    page_data = json.dumps({'result': make_items(keyword, page, per_page)},
+                           ensure_ascii=False)
+    # 真实页面有大量与商品无关的标记
+    body = '\n'.join(
+        f'<div class="item"><a href="//item.jd.com/{i}.html">推荐 {i}</a>'
+        f'<span class="p">¥{i}.00</span></div>'
+        for i in range(filler))
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8">'
+        '<title>京东搜索</title>'
+        '<script type="text/javascript">var conf = {"ver": 1};</script>'
+        '</head><body>'
+        f'<script type="text/javascript">var pageData = {page_data};</script>'
+        f'{body}'
+        '<script>window.loaded = true;</script>'
+        '</body></html>')
+
+
+def respond(path, query, pages):
+    # 返回 (Content-Type, 响应体)，未知路径返回 None
+    if path == '/search':
+        query = parse_qs(query)
+        keyword = query.get('keyword', [''])[0]
+        page = int(query.get('page', ['1'])[0])
+        items = PER_PAGE if page <= pages else 0
+        body = make_search_page(keyword, page, items).encode('utf-8')
+        return 'text/html; charset=utf-8', body
+    if path.startswith('/n1/'):
+        return 'image/jpeg', make_jpeg(zlib.crc32(path.encode()))
+    return None
+
+
+def mock_transport(pages=5):
+    # 不经过网络的 httpx 传输层，按同样的规则生成搜索页和图片
+    import httpx
+
+    def handler(request):
+        response = respond(request.url.path, request.url.query.decode(),
+                           pages)
+        if response is None:
+            return httpx.Response(404)
+        content_type, body = response
+        return httpx.Response(
+            200, headers={'Content-Type': content_type}, content=body)
+
+    return httpx.MockTransport(handler)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        response = respond(url.path, url.query, self.server.pages)
+        if response is None:
+            self.send_error(404)
+            return
+        content_type, body = response
+        self.server.requests += 1
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    request_queue_size = 1024
+
+
+class FakeJD:
+    def __init__(self, pages=5):
+        self.server = _Server(('127.0.0.1', 0), _Handler)
+        self.server.daemon_threads = True
+        self.server.pages = pages
+        self.server.requests = 0
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True)
+
+    @property
+    def requests(self):
+        return self.server.requests
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,163 @@
+# 多进程压力测试：N 个进程同时打开同一个数据库，随机加购、结算、改价、
+# 新增和删除商品、注册用户，期间定时 poll_changes；全部写完后每个进程再同步一次，
+# 检查内存中的数据与数据库一致，订单和商品没有丢失
+# 用法：python -m benchmarks.stress_multiprocess [进程数] [每个进程的操作数]
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+from models import Product, User
+from store import Store
+
+PRODUCTS = 200
+POLL_EVERY = 10  # 每隔多少次操作同步一次其他进程的修改
+TIMEOUT = 600  # 秒，子进程卡住时不要一直等下去
+
+
+def snapshot(store):
+    conn = store.conn
+    return {
+        'products': conn.execute(
+            'SELECT id, name, price FROM products ORDER BY id').fetchall(),
+        'users': sorted(row[0] for row in conn.execute(
+            'SELECT username FROM users')),
+    }
+
+
+def worker(path, index, operations, barrier, results):
+    rng = random.Random(index)
+    store = Store(path)
+    user = User(f'worker{index}', 'x')
+    store.add_user(user)
+    store.ensure_catalog()
+    checkouts = []
+    deleted = set()
+    added = registered = 0
+    poll_times = []
+    for step in range(operations):
+        action = rng.random()
+        products = store.products
+        if action < 0.45 and products:
+            store.add_to_cart(user, products[rng.randrange(len(products))],
+                              rng.randint(1, 3))
+        elif action < 0.55 and store.get_cart(user):
+            product = store.get_product(rng.choice(list(user.cart)))
+            if product is not None:
+                store.remove_from_cart(user, product)
+        elif action < 0.65:
+            checkouts.append(store.checkout(user))
+        elif action < 0.8 and products:
+            # 改价可能与其他进程冲突，以最后写入的为准
+            product = products[rng.randrange(len(products))]
+            store.update_product(product, product.name,
+                                 rng.randrange(100, 100000))
+        elif action < 0.95:
+            added += len(store.add_products([Product(
+                f'进程{index} 新商品 {step}', rng.randrange(100, 100000))]))
+        elif action < 0.98:
+            registered += store.add_user(User(f'worker{index}-{step}', 'x'))
+        elif products:
+            # 其他进程购物车中的这件商品随之删除
+            product = products[rng.randrange(len(products))]
+            deleted.add(product.id)
+            store.delete_product(product)
+        if step % POLL_EVERY == 0:
+            start = time.perf_counter()
+            store.poll_changes()
+            poll_times.append(time.perf_counter() - start)
+
+    store.flush()
+    barrier.wait(TIMEOUT)  # 所有进程都写完之后再做最后一次同步
+    store.poll_changes()
+    expected = snapshot(store)
+    cart = dict(store.conn.execute(
+        'SELECT product_id, quantity FROM cart_items WHERE username = ?',
+        (user.username,)))
+    consistent = (
+        [(p.id, p.name, p.price) for p in store.products] ==
+        expected['products'] and
+        sorted(u.username for u in store.users) == expected['users'] and
+        store.get_cart(user) == cart)
+    poll_times.sort()
+    results.put({
+        'index': index,
+        'consistent': consistent,
+        'checkouts': len(checkouts),
+        'revenue': sum(checkouts),
+        'added': added,
+        'deleted': deleted,
+        'registered': registered + 1,
+        'poll_p50_ms': poll_times[len(poll_times) // 2] * 1000,
+        'poll_max_ms': poll_times[-1] * 1000,
+    })
+    store.close()
+
+
+def run(processes, operations):
+    # 返回 (各项检查, 各进程的报告, 汇总)；tests/test_multiprocess.py 也用它
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'data.db')
+        store = Store(path)
+        store.add_user(User('admin', 'admin'))
+        store.add_products(Product(f'初始商品 {i}', 100 * (i + 1))
+                           for i in range(PRODUCTS))
+        store.close()
+
+        barrier = context.Barrier(processes)
+        results = context.Queue()
+        start = time.perf_counter()
+        workers = [context.Process(
+            target=worker, args=(path, i, operations, barrier, results))
+            for i in range(processes)]
+        for process in workers:
+            process.start()
+        reports = sorted((results.get(timeout=TIMEOUT) for _ in workers),
+                         key=lambda report: report['index'])
+        for process in workers:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+        store = Store(path)
+        orders, revenue = store.revenue()
+        products = len(store.products)
+        users = len(store.users)
+        store.close()
+
+    checks = {
+        '各进程内存与数据库一致': all(r['consistent'] for r in reports),
+        '订单数': orders == sum(r['checkouts'] for r in reports),
+        '营业额': revenue == sum(r['revenue'] for r in reports),
+        # 两个进程可能删除同一件商品
+        '商品数': products == PRODUCTS + sum(r['added'] for r in reports) -
+        len(set().union(*(r['deleted'] for r in reports))),
+        '用户数': users == 1 + sum(r['registered'] for r in reports),
+        '子进程正常退出': all(p.exitcode == 0 for p in workers),
+    }
+    summary = {'elapsed': elapsed, 'orders': orders, 'products': products,
+               'users': users}
+    return checks, reports, summary
+
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    operations = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    checks, reports, summary = run(processes, operations)
+    print(f'{processes} 个进程 × {operations} 次操作，'
+          f'用时 {summary["elapsed"]:.2f} s；订单 {summary["orders"]} 个，'
+          f'商品 {summary["products"]} 件，用户 {summary["users"]} 个')
+    for report in reports:
+        print(f'  进程 {report["index"]}: 结算 {report["checkouts"]} 次，'
+              f'新增商品 {report["added"]} 件，同步 p50 '
+              f'{report["poll_p50_ms"]:.2f} ms / 最大 '
+              f'{report["poll_max_ms"]:.2f} ms')
+    for name, ok in checks.items():
+        print(f'  {name}: {"OK" if ok else "失败"}')
+    return 0 if all(checks.values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
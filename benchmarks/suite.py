@@ -0,0 +1,317 @@
+# 离线基准测试套件：关键字导入、数据库读写、登录查找、商品搜索、启动和界面列表，
+# 全部使用本地模拟的京东搜索页和图片，结果以 JSON 输出，便于比较不同版本
+# 用法：python -m benchmarks.suite [--only import store ...] [--sizes 1000 10000]
+#                                  [--output results.json]
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+from models import Product
+
+SIZES = [1000, 10000, 100000]
+KEYWORDS = ['手机', '笔记本', '耳机', '显示器']
+PAGES = 5
+QUERIES = ['手机', '测试商品', '型号 x12', '轻薄 笔记本 电脑']
+
+
+@contextmanager
+def workdir():
+    # 数据库、缩略图目录和 HTTP 缓存都是相对路径，在临时目录中运行互不影响
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            yield directory
+        finally:
+            os.chdir(cwd)
+
+
+def make_products(count, seed=0):
+    rng = random.Random(seed)
+    words = ['手机', '笔记本', '电脑', '耳机', '轻薄', '游戏', '办公', '学生',
+             '旗舰', '无线', '蓝牙', '显示器', '键盘', '鼠标']
+    return [Product(f'{" ".join(rng.sample(words, 4))} 测试商品 型号 X{i % 97}',
+                    rng.randrange(100, 1000000), sku=str(i))
+            for i in range(count)]
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def median_time(func, repeat=5):
+    times = sorted(timed(func)[0] for _ in range(repeat))
+    return times[len(times) // 2]
+
+
+# 端到端导入：搜索页 -> 去重 -> 下载图片 -> 进程池生成缩略图 -> 写入数据库
+def bench_import(args):
+    import net
+    from benchmarks.fakejd import mock_transport
+    from images import shutdown_executor
+    from pipeline import import_keyword
+    from store import Store
+
+    async def import_all(store):
+        try:
+            return await asyncio.gather(*(
+                import_keyword(keyword, store.add_products, store.has_product,
+                               args.pages)
+                for keyword in args.keywords))
+        finally:
+            await net.close_fetcher()
+
+    results = {}
+    net.TRANSPORT = mock_transport(args.pages)
+    try:
+        with workdir():
+            # cold：HTTP 缓存和缩略图目录为空；warm：换一个空数据库再导入一次，
+            # 搜索页和缩略图都已在本地
+            for run in ('cold', 'warm'):
+                store = Store(f'{run}.db')
+                elapsed, stats = timed(asyncio.run, import_all(store))
+                store.close()
+                imported = sum(s.imported for s in stats)
+                results[run] = {
+                    'keywords': len(args.keywords),
+                    'pages': args.pages,
+                    'imported': imported,
+                    'failed': sum(s.failed for s in stats),
+                    'seconds': round(elapsed, 3),
+                    'items_per_second': round(imported / elapsed, 1),
+                }
+    finally:
+        net.TRANSPORT = None
+        shutdown_executor()
+    return results
+
+
+# 批量写入商品，重新打开数据库，分别载入用户和商品目录
+def bench_store(args):
+    from store import Store
+
+    results = {}
+    for size in args.sizes:
+        with workdir():
+            store = Store('bench.db')
+            save, _ = timed(store.add_products, make_products(size))
+            store.close()
+            open_, store = timed(Store, 'bench.db')
+            catalog, _ = timed(store.ensure_catalog)
+            store.close()
+            results[size] = {
+                'save_seconds': round(save, 3),
+                'open_seconds': round(open_, 4),
+                'load_catalog_seconds': round(catalog, 3),
+                'db_bytes': os.path.getsize('bench.db'),
+            }
+    return results
+
+
+# 大量用户时的启动载入和登录查找
+def bench_login(args):
+    from store import Store
+
+    results = {}
+    for size in args.sizes:
+        with workdir():
+            store = Store('bench.db')
+            with store.conn:
+                store.conn.executemany(
+                    'INSERT INTO users (username, password, role) '
+                    'VALUES (?, ?, ?)',
+                    [(f'user{i}', f'pw{i}', 'user') for i in range(size)])
+            store.close()
+            open_, store = timed(Store, 'bench.db')
+            rng = random.Random(0)
+            names = [f'user{rng.randrange(size)}' for _ in range(10000)]
+
+            def login():
+                for name in names:
+                    user = store.get_user(name)
+                    assert user.password == f'pw{name[4:]}'
+
+            lookup = median_time(login) / len(names)
+            store.close()
+            results[size] = {
+                'load_users_seconds': round(open_, 4),
+                'lookup_microseconds': round(lookup * 1e6, 3),
+            }
+    return results
+
+
+# 建立搜索索引，以及关键字和价格区间查询
+def bench_search(args):
+    from catalog import Catalog
+    from search import CatalogIndex
+
+    results = {}
+    for size in args.sizes:
+        catalog = Catalog()
+        catalog.extend((id, p.name, p.price, p.image_key, p.sku)
+                       for id, p in enumerate(make_products(size), 1))
+        index = CatalogIndex(catalog)
+        build, _ = timed(index.add_all)
+        queries = {query: median_time(lambda: index.search(query))
+                   for query in QUERIES}
+        queries['price 100-200'] = median_time(
+            lambda: index.search('', 10000, 20000))
+        queries['手机 by price'] = median_time(
+            lambda: index.search('手机', sort='price'))
+        results[size] = {
+            'build_seconds': round(build, 3),
+            'query_ms': {query: round(seconds * 1000, 3)
+                         for query, seconds in queries.items()},
+        }
+    return results
+
+
+# 冷启动：新进程中导入 main 并打开数据库（有显示时创建窗口）
+def bench_startup(args):
+    from benchmarks.bench_startup import make_data, run
+
+    results = {}
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            make_data(os.path.join(directory, 'data.db'), size)
+            login, catalog, _, heavy = min(run(directory) for _ in range(3))
+        results[size] = {
+            'login_seconds': round(login, 3),
+            'catalog_seconds': round(catalog, 3),
+            'heavy_modules': heavy,
+        }
+    return results
+
+
+@contextmanager
+def display():
+    # 没有显示器时尝试启动 Xvfb，都没有时返回 False
+    if os.environ.get('DISPLAY'):
+        yield True
+        return
+    if shutil.which('Xvfb') is None:
+        yield False
+        return
+    server = subprocess.Popen(
+        ['Xvfb', ':99', '-screen', '0', '1280x1024x24', '-nolisten', 'tcp'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.environ['DISPLAY'] = ':99'
+    try:
+        time.sleep(0.5)
+        yield True
+    finally:
+        del os.environ['DISPLAY']
+        server.terminate()
+        server.wait()
+
+
+# 界面：用户面板的虚拟列表和管理员面板的 Listbox
+def bench_ui(args):
+    with display() as available:
+        if not available:
+            return {'skipped': '没有 DISPLAY，也没有 Xvfb'}
+        import tkinter as tk
+
+        from main import AdminPanel
+        from widgets import VirtualProductList
+
+        results = {}
+        for size in args.sizes:
+            products = make_products(size)
+            root = tk.Tk()
+            root.geometry('1000x800')
+            product_list = VirtualProductList(root)
+            product_list.pack(fill='both', expand=True)
+            root.update()
+
+            def build():
+                product_list.set_items(products)
+                root.update()
+
+            def scroll():
+                for _ in range(50):
+                    product_list.scroll(10)
+                    root.update()
+
+            virtual = median_time(build)
+            scrolling = median_time(scroll, 3) / 50
+            listbox = tk.Listbox(root)
+            texts = [AdminPanel.product_text(None, product)
+                     for product in products]
+
+            def fill():
+                listbox.delete(0, tk.END)
+                listbox.insert(tk.END, *texts)
+                root.update()
+
+            admin = median_time(fill, 3)
+            root.destroy()
+            results[size] = {
+                'virtual_list_ms': round(virtual * 1000, 3),
+                'scroll_step_ms': round(scrolling * 1000, 3),
+                'admin_listbox_ms': round(admin * 1000, 3),
+            }
+        return results
+
+
+BENCHMARKS = {
+    'import': bench_import,
+    'store': bench_store,
+    'login': bench_login,
+    'search': bench_search,
+    'startup': bench_startup,
+    'ui': bench_ui,
+}
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite')
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS,
+                        default=list(BENCHMARKS))
+    parser.add_argument('--sizes', nargs='+', type=int, default=SIZES)
+    parser.add_argument('--keywords', nargs='+', default=KEYWORDS)
+    parser.add_argument('--pages', type=int, default=PAGES)
+    parser.add_argument('--output', help='结果另存为 JSON 文件')
+    args = parser.parse_args(argv)
+
+    report = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'results': {},
+    }
+    for name in args.only:
+        print(f'运行 {name} ...', file=sys.stderr)
+        report['results'][name] = BENCHMARKS[name](args)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Sequence
+from itertools import compress
+
+from models import Product
+
+_SHA1 = re.compile(r'[0-9a-f]{40}')
+_KEY_BYTES = 20
+_NO_KEY = bytes(_KEY_BYTES)
+
+
+# 商品目录中一行的视图：属性直接读取目录的列，不复制数据
+class ProductView(Product):
+    __slots__ = ('_catalog',)
+
+    def __init__(self, catalog, id):
+        self._catalog = catalog
+        self.id = id
+
+    @property
+    def name(self):
+        return self._catalog.names[self._catalog.position(self.id)]
+
+    @property
+    def price(self):
+        return self._catalog.prices[self._catalog.position(self.id)]
+
+    @property
+    def image_key(self):
+        return self._catalog.image_key(self._catalog.position(self.id))
+
+    @property
+    def sku(self):
+        return self._catalog.sku(self._catalog.position(self.id))
+
+
+# 按列存放的商品目录：id、价格、SKU 和图片键放在紧凑的数组中，
+# 行按 id 递增排列，由 id 二分查找下标；另外维护一份按价格排序的 id，
+# 价格区间筛选和按价格排序都在 C 层完成
+class Catalog(Sequence):
+    def __init__(self):
+        self.ids = array('q')
+        self.prices = array('q')  # 分
+        self.names: list[str] = []
+        self._image_keys = bytearray()  # 每行 20 字节的 SHA-1，全零表示没有图片
+        self._skus = array('q')  # 数字 SKU，-1 表示没有
+        self._odd_image_keys: dict[int, str] = {}  # 不是 SHA-1 的图片键
+        self._odd_skus: dict[int, str] = {}  # 不是数字的 SKU
+        self._price_order = array('q')  # 按 (价格, id) 排序的 id
+        self._price_values = array('q')  # 与 _price_order 对应的价格
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [ProductView(self, id) for id in self.ids[position]]
+        return ProductView(self, self.ids[position])
+
+    def __iter__(self):
+        return (ProductView(self, id) for id in self.ids)
+
+    def __contains__(self, product):
+        return self.has(product.id)
+
+    def __repr__(self):
+        return f'<Catalog {len(self)} products>'
+
+    def has(self, id):
+        position = bisect_left(self.ids, id)
+        return position < len(self.ids) and self.ids[position] == id
+
+    def get(self, id, default=None):
+        return ProductView(self, id) if self.has(id) else default
+
+    def position(self, id):
+        position = bisect_left(self.ids, id)
+        if position == len(self.ids) or self.ids[position] != id:
+            raise KeyError(id)
+        return position
+
+    def image_key(self, position):
+        data = self._image_keys[position * _KEY_BYTES:
+                                (position + 1) * _KEY_BYTES]
+        if data == _NO_KEY:
+            return self._odd_image_keys.get(self.ids[position])
+        return data.hex()
+
+    def sku(self, position):
+        sku = self._skus[position]
+        if sku < 0:
+            return self._odd_skus.get(self.ids[position])
+        return str(sku)
+
+    def _append(self, id, name, price, image_key, sku):
+        if self.ids and id <= self.ids[-1]:
+            raise ValueError(f'商品 id 必须递增：{id}')
+        self._insert(len(self.ids), id, name, price, image_key, sku)
+
+    def _insert(self, position, id, name, price, image_key, sku):
+        self.ids.insert(position, id)
+        self.prices.insert(position, price)
+        self.names.insert(position, name)
+        offset = position * _KEY_BYTES
+        if image_key and _SHA1.fullmatch(image_key):
+            self._image_keys[offset:offset] = bytes.fromhex(image_key)
+        else:
+            self._image_keys[offset:offset] = _NO_KEY
+            if image_key:
+                self._odd_image_keys[id] = image_key
+        sku = str(sku) if sku is not None else None
+        if sku and sku.isdigit() and str(int(sku)) == sku:
+            self._skus.insert(position, int(sku))
+        else:
+            self._skus.insert(position, -1)
+            if sku:
+                self._odd_skus[id] = sku
+
+    def extend(self, rows):
+        # 批量追加 (id, 标题, 价格, 图片键, SKU)，最后一次性重建价格顺序
+        for row in rows:
+            self._append(*row)
+        order = sorted(zip(self.prices, self.ids))
+        self._price_values = array('q', [price for price, _ in order])
+        self._price_order = array('q', [id for _, id in order])
+
+    def add(self, product):
+        # 新商品的 id 通常最大，直接追加；其他进程先写入的商品按 id 插到中间
+        position = bisect_left(self.ids, product.id)
+        if position < len(self.ids) and self.ids[position] == product.id:
+            raise ValueError(f'商品已存在：{product.id}')
+        self._insert(position, product.id, product.name, product.price,
+                     product.image_key, product.sku)
+        self._insert_price(product.id, product.price)
+
+    def update(self, id, name, price):
+        position = self.position(id)
+        self._remove_price(id, self.prices[position])
+        self.names[position] = name
+        self.prices[position] = price
+        self._insert_price(id, price)
+
+    def remove(self, product):
+        return self.pop(product.id)
+
+    def pop(self, id):
+        position = self.position(id)
+        self._remove_price(id, self.prices[position])
+        del self.ids[position]
+        del self.prices[position]
+        del self.names[position]
+        del self._image_keys[position * _KEY_BYTES:
+                             (position + 1) * _KEY_BYTES]
+        del self._skus[position]
+        self._odd_image_keys.pop(id, None)
+        self._odd_skus.pop(id, None)
+
+    def clear(self):
+        self.__init__()
+
+    def _insert_price(self, id, price):
+        position = self._price_slot(id, price)
+        self._price_order.insert(position, id)
+        self._price_values.insert(position, price)
+
+    def _remove_price(self, id, price):
+        position = self._price_slot(id, price)
+        del self._price_order[position]
+        del self._price_values[position]
+
+    def _price_slot(self, id, price):
+        # 同价格的商品按 id 排列
+        low = bisect_left(self._price_values, price)
+        high = bisect_right(self._price_values, price, low)
+        return bisect_left(self._price_order, id, low, high)
+
+    def price_range(self, low=None, high=None):
+        # 价格在 [low, high] 内的商品 id，按价格升序
+        begin = bisect_left(self._price_values, low) \
+            if low is not None else 0
+        end = bisect_right(self._price_values, high) \
+            if high is not None else len(self._price_values)
+        return self._price_order[begin:end]
+
+    def sort_by_price(self, ids, reverse=False):
+        # 在按价格排好序的 id 上筛选出 ids，不逐个比较价格
+        ids = ids if isinstance(ids, (set, frozenset)) else set(ids)
+        order = self._price_order[::-1] if reverse else self._price_order
+        return list(compress(order, map(ids.__contains__, order)))
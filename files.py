@@ -0,0 +1,37 @@
+import os
+import threading
+
+
+def atomic_write(path, data, durable=True):
+    # 先写临时文件再改名，读者只会看到旧文件或完整的新文件；
+    # durable 时先把内容和目录项 fsync 到磁盘，断电后也不会留下空文件
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    if durable:
+        _fsync_dir(os.path.dirname(path) or '.')
+
+
+def _fsync_dir(path):
+    # Windows 不能打开目录，改名本身已经是原子的
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import httpx
+
+from files import atomic_write
+
+CACHE_DIR = os.path.join('cache', 'http')
+CACHE_TTL = 6 * 3600  # 秒，过期后用 ETag / Last-Modified 发条件请求
+CACHE_BYTES = 256 * 1024 * 1024
+
+
+class CacheEntry:
+    def __init__(self, url, body, meta):
+        self.url = url
+        self.body = body
+        self.meta = meta
+
+    def fresh(self, ttl):
+        return time.time() - self.meta['stored_at'] < ttl
+
+    def validators(self):
+        headers = {}
+        if self.meta.get('etag'):
+            headers['If-None-Match'] = self.meta['etag']
+        if self.meta.get('last_modified'):
+            headers['If-Modified-Since'] = self.meta['last_modified']
+        return headers
+
+    def response(self):
+        return httpx.Response(
+            200,
+            headers={'Content-Type': self.meta.get('content_type', '')},
+            content=self.body,
+            request=httpx.Request('GET', self.url))
+
+
+# 磁盘上的 HTTP 响应缓存，超过容量时按最近使用时间淘汰
+class DiskCache:
+    def __init__(self, root=CACHE_DIR, ttl=CACHE_TTL, max_bytes=CACHE_BYTES):
+        self.root = root
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._total_bytes = None
+        self._lock = threading.Lock()
+
+    def _path(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.root, key[:2], key[2:])
+
+    def get(self, url):
+        path = self._path(url)
+        try:
+            with open(path + '.json', 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(path, 'rb') as f:
+                body = f.read()
+        except (FileNotFoundError, ValueError):
+            return None
+        if meta.get('url') != url or len(body) != meta.get('size'):
+            return None
+        os.utime(path)  # 记录最近使用时间，供 LRU 淘汰
+        return CacheEntry(url, body, meta)
+
+    def put(self, url, response):
+        if 'no-store' in response.headers.get('Cache-Control', ''):
+            return
+        path = self._path(url)
+        body = response.content
+        meta = {
+            'url': url,
+            'size': len(body),
+            'stored_at': time.time(),
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'content_type': response.headers.get('Content-Type', ''),
+        }
+        old_size = os.path.getsize(path) if os.path.exists(path) else 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 缓存丢了只需重新下载，不必 fsync
+        atomic_write(path, body, durable=False)
+        atomic_write(path + '.json', json.dumps(meta).encode('utf-8'),
+                     durable=False)
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += len(body) - old_size
+        self._evict()
+
+    def touch(self, entry):
+        # 304 Not Modified：内容不变，重新计算有效期
+        entry.meta['stored_at'] = time.time()
+        atomic_write(self._path(entry.url) + '.json',
+                     json.dumps(entry.meta).encode('utf-8'), durable=False)
+
+    def _scan(self):
+        files = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith('.json') or name.endswith('.tmp'):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _evict(self):
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._scan())
+            if self._total_bytes <= self.max_bytes:
+                return
+            # 一次淘汰到容量的 90%，避免每次写入都扫描目录
+            target = self.max_bytes * 0.9
+            for _, size, path in sorted(self._scan()):
+                if self._total_bytes <= target:
+                    break
+                for victim in (path, path + '.json'):
+                    try:
+                        os.remove(victim)
+                    except FileNotFoundError:
+                        pass
+                self._total_bytes -= size
+
+
+http_cache = DiskCache()
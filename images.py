@@ -0,0 +1,159 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from functools import cache
+from io import BytesIO
+
+from files import atomic_write
+from metrics import metrics
+
+# PIL 在第一次处理图片时才导入，登录界面不需要它
+
+IMAGE_DIR = 'images'
+CACHE_BYTES = 32 * 1024 * 1024  # 解码后的图片最多占用的内存
+
+THUMBNAIL_WIDTH = 100
+IMAGE_WORKERS = os.cpu_count() or 2  # 解码和缩放图片的进程数
+
+
+def image_key(source):
+    # source 可以是图片的 URL，也可以是图片的原始字节
+    if isinstance(source, str):
+        source = source.encode('utf-8')
+    return hashlib.sha1(source).hexdigest()
+
+
+@cache
+def thumbnail_format():
+    from PIL import features
+
+    return 'WEBP' if features.check('webp') else 'PNG'
+
+
+def encode_thumbnail(image):
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert(
+            'RGBA' if 'transparency' in image.info else 'RGB')
+    buffer = BytesIO()
+    if thumbnail_format() == 'WEBP':
+        image.save(buffer, format='WEBP', quality=85, method=4)
+    else:
+        image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def make_thumbnail(source, max_width=THUMBNAIL_WIDTH, max_height=None):
+    # 在进程池中执行：source 是图片字节或文件路径，返回编码后的缩略图字节
+    from PIL import Image
+
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+    image = Image.open(source)
+    width, height = image.size
+    scale = min(1, max_width / width)
+    if max_height is not None:
+        scale = min(scale, max_height / height)
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    # JPEG 直接按 1/2、1/4、1/8 缩小解码，省去大部分解码和缩放开销
+    image.draft('RGB', size)
+    if image.size != size:
+        image = image.resize(size, Image.BILINEAR, reducing_gap=2.0)
+    return encode_thumbnail(image)
+
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # 主进程里有 Tk 和事件循环线程，用 spawn 避免 fork 带来的锁状态
+        _executor = ProcessPoolExecutor(
+            IMAGE_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+    _executor = None
+
+
+# 以内容哈希为键的缩略图目录，解码结果放在有内存上限的 LRU 缓存中
+class ImageStore:
+    def __init__(self, root=IMAGE_DIR, max_bytes=CACHE_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key[2:])
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def put_bytes(self, key, data):
+        path = self.path(key)
+        if os.path.exists(path):
+            return key
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write(path, data)
+        return key
+
+    def put(self, image, key=None):
+        data = encode_thumbnail(image)
+        return self.put_bytes(key or image_key(data), data)
+
+    def discard(self, key):
+        with self._lock:
+            self._evict(key)
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def get(self, key):
+        with self._lock:
+            image = self._cache.get(key)
+            if image is not None:
+                self._cache.move_to_end(key)
+                metrics.count('image_cache.hit')
+                return image
+        metrics.count('image_cache.miss')
+
+        from PIL import Image
+
+        try:
+            with open(self.path(key), 'rb') as f:
+                image = Image.open(BytesIO(f.read()))
+                image.load()
+        except (FileNotFoundError, OSError):
+            return None
+
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = image
+                self._cache_bytes += _image_bytes(image)
+                while self._cache_bytes > self.max_bytes and len(self._cache) > 1:
+                    self._evict(next(iter(self._cache)))
+        return image
+
+    def _evict(self, key):
+        image = self._cache.pop(key, None)
+        if image is not None:
+            self._cache_bytes -= _image_bytes(image)
+
+
+def _image_bytes(image):
+    width, height = image.size
+    return width * height * len(image.getbands())
+
+
+image_store = ImageStore()
@@ -0,0 +1,152 @@
+import argparse
+import asyncio
+import json
+import os
+
+from tqdm import tqdm
+
+import net
+import pipeline
+import recommend
+from files import atomic_write
+from images import shutdown_executor
+from metrics import metrics
+from store import DB_PATH, open_store
+
+CHECKPOINT_PATH = 'import.checkpoint.json'
+KEYWORD_JOBS = 4  # 同时导入的关键字数
+
+
+def read_keywords(path):
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f
+                if line.strip() and not line.lstrip().startswith('#')]
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding='utf-8') as f:
+        return set(json.load(f).get('done', []))
+
+
+def save_checkpoint(path, done):
+    atomic_write(path, json.dumps(
+        {'done': sorted(done)}, ensure_ascii=False).encode('utf-8'))
+
+
+async def import_keywords(store, keywords, args, done):
+    # 关键字导入完成后才记入检查点；中断后重新运行时，
+    # 未完成关键字中已经写入的商品会被去重跳过
+    semaphore = asyncio.Semaphore(args.jobs)
+    totals = pipeline.ImportStats()
+    bar = tqdm(total=len(keywords), unit='kw')
+
+    def on_batch(batch):
+        totals.imported += len(store.add_products(batch))
+        bar.set_postfix(imported=totals.imported)
+
+    async def run(keyword):
+        async with semaphore:
+            try:
+                stats = await pipeline.import_keyword(
+                    keyword, on_batch, store.has_product, args.pages,
+                    args.max_items, batch_size=args.batch_size)
+            except Exception as e:
+                tqdm.write(f'{keyword}: {e}, 无法获取数据')
+                return
+        totals.found += stats.found
+        totals.skipped += stats.skipped
+        totals.failed += stats.failed
+        done.add(keyword)
+        save_checkpoint(args.checkpoint, done)
+        bar.update()
+
+    try:
+        await asyncio.gather(*(run(keyword) for keyword in keywords))
+    finally:
+        bar.close()
+        await net.close_fetcher()
+    return totals
+
+
+def run_import(args):
+    keywords = list(args.keyword)
+    if args.keywords_file:
+        keywords += read_keywords(args.keywords_file)
+    keywords = list(dict.fromkeys(keywords))
+    if not keywords:
+        print('没有要导入的关键字')
+        return 1
+
+    done = load_checkpoint(args.checkpoint) if not args.restart else set()
+    pending = [keyword for keyword in keywords if keyword not in done]
+    print(f'关键字 {len(keywords)} 个，已完成 {len(keywords) - len(pending)} 个')
+
+    net.CONCURRENCY = args.concurrency
+    pipeline.IMAGE_TASKS = args.concurrency
+    store = open_store(args.db)
+    try:
+        totals = asyncio.run(import_keywords(store, pending, args, done))
+        # 商品目录是按需载入的，没有用到时不必为了计数而载入
+        count = store.conn.execute(
+            'SELECT COUNT(*) FROM products').fetchone()[0]
+    except KeyboardInterrupt:
+        print('已中断，重新运行同样的命令即可继续')
+        return 130
+    finally:
+        shutdown_executor()
+        store.close()
+        metrics.close()
+    print(f'新增 {totals.imported} 件，跳过重复 {totals.skipped} 件，'
+          f'图片失败 {totals.failed} 件，商品总数 {count}')
+    return 0
+
+
+def run_recommend(args):
+    open_store(args.db).close()  # 建表和迁移
+    try:
+        products = recommend.rebuild(args.db, args.top_k, args.score)
+    finally:
+        metrics.close()
+    seconds = metrics.percentile('recommend.rebuild', 50)
+    print(f'{products} 件商品有推荐，用时 {seconds:.2f} s')
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='main.py')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    parser_import = commands.add_parser('import', help='批量导入京东商品')
+    parser_import.add_argument('--keywords-file', help='每行一个关键字')
+    parser_import.add_argument('--keyword', action='append', default=[],
+                               help='要导入的关键字，可重复')
+    parser_import.add_argument('--concurrency', type=int,
+                               default=net.CONCURRENCY, help='并发请求数')
+    parser_import.add_argument('--jobs', type=int, default=KEYWORD_JOBS,
+                               help='同时导入的关键字数')
+    parser_import.add_argument('--pages', type=int,
+                               default=pipeline.MAX_PAGES,
+                               help='每个关键字抓取的页数')
+    parser_import.add_argument('--max-items', type=int, default=None,
+                               help='每个关键字最多导入的商品数')
+    parser_import.add_argument('--batch-size', type=int,
+                               default=pipeline.BATCH_SIZE)
+    parser_import.add_argument('--db', default=DB_PATH)
+    parser_import.add_argument('--checkpoint', default=CHECKPOINT_PATH)
+    parser_import.add_argument('--restart', action='store_true',
+                               help='忽略检查点，重新导入全部关键字')
+    parser_import.set_defaults(func=run_import)
+
+    parser_recommend = commands.add_parser(
+        'recommend', help='根据历史订单重建“经常一起购买”的推荐')
+    parser_recommend.add_argument('--db', default=DB_PATH)
+    parser_recommend.add_argument('--top-k', type=int, default=recommend.TOP_K,
+                                  help='每件商品保留的相关商品数')
+    parser_recommend.add_argument('--score', choices=('cosine', 'lift'),
+                                  default=recommend.SCORE)
+    parser_recommend.set_defaults(func=run_recommend)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
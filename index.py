@@ -0,0 +1,65 @@
+from bisect import bisect_left
+from collections.abc import Sequence
+
+
+# 按主键 O(1) 查找的有序集合，同时保留插入顺序，可以按下标访问，
+# 也可以由主键查到下标（对递增的序号二分），供列表控件按位置增删
+class OrderedIndex(Sequence):
+    def __init__(self, key, items=()):
+        self.key = key
+        self._items = {}
+        self._seqs = {}
+        self._order_seqs = []  # 递增的插入序号
+        self._order_keys = []  # 与 _order_seqs 一一对应的主键
+        self._next_seq = 0
+        for item in items:
+            self.add(item)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self._items[key] for key in self._order_keys[position]]
+        return self._items[self._order_keys[position]]
+
+    def __iter__(self):
+        return iter(self._items.values())
+
+    def __contains__(self, item):
+        return self.key(item) in self._items
+
+    def __repr__(self):
+        return repr(list(self._items.values()))
+
+    def get(self, key, default=None):
+        return self._items.get(key, default)
+
+    def position(self, key):
+        return bisect_left(self._order_seqs, self._seqs[key])
+
+    def add(self, item):
+        key = self.key(item)
+        if key in self._items:
+            raise KeyError(key)
+        self._items[key] = item
+        self._seqs[key] = self._next_seq
+        self._order_seqs.append(self._next_seq)
+        self._order_keys.append(key)
+        self._next_seq += 1
+
+    def remove(self, item):
+        return self.pop(self.key(item))
+
+    def pop(self, key):
+        position = self.position(key)
+        del self._order_seqs[position]
+        del self._order_keys[position]
+        del self._seqs[key]
+        return self._items.pop(key)
+
+    def clear(self):
+        self._items.clear()
+        self._seqs.clear()
+        self._order_seqs.clear()
+        self._order_keys.clear()
@@ -1,119 +1,24 @@
-import asyncio
-import json
-import os
-import pickle
 import sys
+import time
 import tkinter as tk
-from io import BytesIO
 from tkinter import filedialog, font, messagebox, ttk
 
-import httpx
-from bs4 import BeautifulSoup
-from PIL import Image, ImageTk
-from tqdm import tqdm
+from images import (get_executor, image_key, image_store, make_thumbnail,
+                    shutdown_executor)
+from metrics import metrics, profile_from_env
+from models import Product, User, format_price, parse_price, product_key
+from store import open_store
+from widgets import SearchBar, VirtualProductList
 
-
-class Product:
-    def __init__(self, name, price, image=None):
-        self.name = name
-        self.price = price
-        self.image = image
-
-    def __repr__(self):
-        return f"<Goods {self.name}>"
-
-    def __hash__(self) -> int:
-        return hash(self.name)
-
-
-class User:
-    def __init__(self, username, password):
-        self.username = username
-        self.password = password
-        self.cart = []
-        self.role = "user"
-
-    def __eq__(self, value: object) -> bool:
-        return self.username == value.username
-
-    def __repr__(self) -> str:
-        return f"<User {self.username}>"
-
-    def add_to_cart(self, product):
-        self.cart.append(product)
-
-    def checkout(self):
-        total_amount = sum(float(item.price) for item in self.cart)
-        self.cart = []
-        return total_amount
-
-
-class Admin(User):
-    def __init__(self, username, password):
-        super().__init__(username, password)
-        self.role = "admin"
-
-
-users: list[User] = []  # 用户数据：username -> password
-products: list[Product] = []  # 商品数据：[{id, title, price, image_path}, ...]
+# 网络、抓取和事件循环相关的模块在第一次抓取商品时才导入，
+# 普通用户登录不需要加载 httpx、bs4 等
 
 
+CO_PURCHASES_SHOWN = 5  # “经常一起购买”中显示的商品数
 FONT_SIZE = 14
 if 'linux' in sys.platform:
     FONT_SIZE = 16  # 更大的字体适配 Linux
-
-
-async def load_image_async(image_url):
-    async with httpx.AsyncClient() as client:
-        response = await client.get('http://img13.360buyimg.com/n1/' + image_url)
-        img_data = response.content
-        image = Image.open(BytesIO(img_data))
-        img_width, img_height = image.size
-        new_width = min(100, img_width)
-        new_height = int((new_width / img_width) * img_height)
-        image = image.resize((new_width, new_height))
-        return image
-
-
-async def get_product_data(keyword):
-    url = f'https://re.jd.com/search?keyword={keyword}&enc=utf-8'
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url)
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        scripts = soup.find_all('script', type='text/javascript')
-
-        if response.status_code == 200:
-            data = scripts[1].text.strip().split('var pageData = ')[-1][:-1]
-            return json.loads(data).get('result', [])
-        else:
-            messagebox.showerror(
-                "错误", f"{response.status_code}, 无法获取数据")
-            return []
-
-
-# 保存和加载数据的帮助函数
-def init_data():
-    global users, products
-    if not os.path.exists('data.pkl'):
-        users = [User("admin", "admin")]
-        save_data()
-
-
-def save_data():
-    with open('data.pkl', 'wb') as f:
-        pickle.dump((users, products), f)
-
-
-def load_data():
-    global users, products
-    if os.path.exists('data.pkl'):
-        with open('data.pkl', 'rb') as f:
-            users, products = pickle.load(f)
-            pass
-
-
-init_data()
+CHANGE_POLL_INTERVAL = 1000  # 毫秒，检查其他窗口（进程）修改的间隔
 
 
 class MainApplication(tk.Frame):
@@ -156,14 +61,14 @@ class MainApplication(tk.Frame):
     def login(self):
         username = self.username.get()
         password = self.password.get()
-        user = User(username, password)
-        for u in users:
-            if u == user and u.password == user.password:
+        user = self.master.store.get_user(username)
+        if user is not None and user.password == password:
+            # 包括载入商品目录和创建面板的时间
+            with metrics.timer("ui.login", role=user.role):
                 if username == "admin":
-                    self.master.switch_frame(AdminPanel, u)
+                    self.master.switch_frame(AdminPanel, user)
                 else:
-                    self.master.switch_frame(UserPanel, u)
-                return
+                    self.master.switch_frame(UserPanel, user)
         else:
             messagebox.showerror("错误", "用户名或密码错误", parent=self)
 
@@ -177,9 +82,7 @@ class MainApplication(tk.Frame):
             return
         user = User(username, password)
 
-        if user not in users:
-            users.append(user)
-            save_data()
+        if self.master.store.add_user(user):
             messagebox.showinfo("提示", "注册成功", parent=self)
         else:
             messagebox.showerror("错误", "用户名已存在", parent=self)
@@ -196,8 +99,15 @@ class UserPanel(tk.Frame):
         self.pack()
         self.create_widgets()
 
-        self.selected_panel = None
+        self.selected_product = None
         self.refresh_product_list()
+        self.show_co_purchases(None)
+        # 有新订单时在后台重建推荐
+        self.after_idle(self.master.store.refresh_co_purchases)
+
+        # 其他进程修改商品时更新显示全部商品的列表
+        self.unsubscribe = self.master.store.subscribe(self.on_store_change)
+        self.bind("<Destroy>", self.on_destroy)
 
     def create_widgets(self):
         button_label = tk.Label(self)
@@ -207,6 +117,10 @@ class UserPanel(tk.Frame):
             button_label, text="添加至购物车", command=self.add_to_cart)
         self.add_to_cart_btn.pack(side="left", padx=5, pady=5)
 
+        self.remove_from_cart_btn = tk.Button(
+            button_label, text="移出购物车", command=self.remove_from_cart)
+        self.remove_from_cart_btn.pack(side="left", padx=5, pady=5)
+
         self.show_cart_btn = tk.Button(
             button_label, text="查看购物车", command=self.show_cart)
         self.show_cart_btn.pack(side="left", padx=5, pady=5)
@@ -219,112 +133,193 @@ class UserPanel(tk.Frame):
             button_label, text="结算", command=self.checkout)
         self.checkout_btn.pack(side="left", padx=5, pady=5)
 
-        self.canvas = tk.Canvas(self)
-        self.scrollbar = ttk.Scrollbar(
-            self, orient="vertical", command=self.canvas.yview)
-        self.scrollable_frame = ttk.Frame(self.canvas)
-
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.canvas.configure(
-                scrollregion=self.canvas.bbox("all")
-            ),
-            add='+'
-        )
-
-        # bottom
-        self.canvas.create_window(
-            (0, 0), window=self.scrollable_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
-        self.scrollbar.pack(side="right", fill="y")
-        self.canvas.pack(side="left", fill="both", expand=True)
+        self.orders_btn = tk.Button(
+            button_label, text="历史订单", command=self.show_orders)
+        self.orders_btn.pack(side="left", padx=5, pady=5)
+
+        self.product_search = SearchBar(
+            self, self.search_products, font=self.default_font)
+        self.product_search.pack(padx=5, pady=5)
+
+        # 选中商品后显示经常与它一起购买的商品
+        self.co_purchase_frame = tk.Frame(self)
+        self.co_purchase_frame.pack(fill="x", padx=10)
+        tk.Label(self.co_purchase_frame, text="经常一起购买：").pack(side="left")
+        self.co_purchase_buttons = []
+
+        self.product_list = VirtualProductList(
+            self, on_select=self.select_product, font=('Arial', FONT_SIZE))
+        self.product_list.pack(side="left", fill="both", expand=True)
 
         # Add this line to occupy full width and height
         self.pack(fill="both", expand=True)
 
         # Bind mouse wheel to scroll the canvas
-        self.canvas.bind_all("<MouseWheel>", self.on_mousewheel)
+        self.product_list.canvas.bind_all("<MouseWheel>", self.on_mousewheel)
+        self.product_list.canvas.bind_all(
+            "<Button-4>", lambda event: self.product_list.scroll(-1))
+        self.product_list.canvas.bind_all(
+            "<Button-5>", lambda event: self.product_list.scroll(1))
 
     def on_mousewheel(self, event):
-        self.canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
+        self.product_list.scroll(int(-1 * (event.delta / 120)))
+
+    def on_destroy(self, event):
+        if event.widget is self:
+            self.unsubscribe()
+
+    def on_store_change(self, event, table, item, position):
+        if table != 'products':
+            return
+        if event == 'reload':
+            self.refresh_product_list()
+            return
+        products = self.master.store.products
+        selected = self.selected_product
+        if selected is not None and not products.has(selected.id):
+            self.selected_product = selected = None
+        if event in ('delete', 'clear'):
+            # “经常一起购买”的按钮可能指向刚删除的商品
+            self.show_co_purchases(selected)
+        items = self.product_list.items
+        if items is products:
+            self.product_list.refresh(
+                None if selected is None else products.position(selected.id))
+            self.product_search.show_total(len(products))
+            return
 
-    def save_data(self):
-        users[users.index(self.user)] = self.user
-        save_data()
+        # 显示搜索结果时只同步删除和修改（已删除商品的视图不能再读取），
+        # 新增的商品重新查找后才会出现
+        if event == 'insert':
+            return
+        if event == 'clear':
+            self.product_list.items = items = []
+            self.product_search.show_total(0)
+        elif event == 'delete':
+            kept = [product for product in items if product.id != item.id]
+            if len(kept) == len(items):
+                return
+            self.product_list.items = items = kept
+            self.product_search.show_total(self.product_search.total - 1)
+        row = None if selected is None else next(
+            (i for i, product in enumerate(items)
+             if product.id == selected.id), None)
+        self.product_list.refresh(row)
 
     def show_cart(self):
-        if not self.user.cart:
+        items = self.master.store.cart_items(self.user)
+        if not items:
             messagebox.showwarning("警告", "购物车为空", parent=self)
             return
 
         cart_items = "\n".join(
-            [f"{item.name} - 价格: ¥{item.price}" for item in self.user.cart])
+            [f"{product.name} - 价格: ¥{format_price(product.price)}"
+             f" × {quantity}" for product, quantity in items])
+        cart_items += f"\n\n合计：¥{format_price(self.user.cart_total)}"
         messagebox.showinfo("购物车", cart_items, parent=self)
 
     def add_to_cart(self):
-        if hasattr(self, 'selected_product') and self.selected_product:
-            self.user.add_to_cart(self.selected_product)
-            self.save_data()
+        if self.selected_product:
+            self.master.store.add_to_cart(self.user, self.selected_product)
             messagebox.showinfo(
                 "提示", f"{self.selected_product.name} 已添加至购物车", parent=self)
         else:
             messagebox.showwarning("警告", "请选择一个商品", parent=self)
 
+    def remove_from_cart(self):
+        store = self.master.store
+        if not self.selected_product or \
+                self.selected_product.id not in store.get_cart(self.user):
+            messagebox.showwarning("警告", "请选择购物车中的商品", parent=self)
+            return
+        store.remove_from_cart(self.user, self.selected_product)
+        messagebox.showinfo(
+            "提示", f"{self.selected_product.name} 已移出购物车", parent=self)
+
     def clear_cart(self):
-        self.user.cart.clear()
-        self.save_data()
+        self.master.store.clear_cart(self.user)
         messagebox.showinfo("提示", "购物车已清空", parent=self)
 
     def checkout(self):
-        if not self.user.cart:
+        if not self.master.store.get_cart(self.user):
             messagebox.showwarning("警告", "购物车为空", parent=self)
             return
 
-        total_amount = self.user.checkout()
-        messagebox.showinfo("合计", f"总金额：￥{total_amount}", parent=self)
-        self.save_data()
+        total_amount = self.master.store.checkout(self.user)
+        self.master.store.refresh_co_purchases()
+        messagebox.showinfo(
+            "合计", f"总金额：￥{format_price(total_amount)}", parent=self)
+
+    def show_orders(self):
+        orders = self.master.store.orders(self.user)
+        if not orders:
+            messagebox.showinfo("历史订单", "暂无订单", parent=self)
+            return
+
+        lines = []
+        for order_id, created, total, items in orders[:10]:
+            created = time.strftime(
+                "%Y-%m-%d %H:%M", time.localtime(created))
+            lines.append(
+                f"订单 {order_id}  {created}  合计 ¥{format_price(total)}")
+            lines += [f"    {name[:20]} ¥{format_price(price)} × {quantity}"
+                      for name, price, quantity in items]
+        messagebox.showinfo("历史订单", "\n".join(lines), parent=self)
 
     def refresh_product_list(self):
-        row = 0
-        for product in products:
-            photo = ImageTk.PhotoImage(product.image)
-
-            self.frame = tk.Frame(self.scrollable_frame,
-                                  borderwidth=2, relief="groove")
-            self.frame.grid(row=row, column=0, padx=10,
-                            pady=10, columnspan=4, sticky="we")
-
-            panel = tk.Label(self.frame, image=photo)
-            panel.image = photo  # keep a reference to avoid garbage collection
-            panel.grid(row=0, column=0, padx=10, pady=10)
-            panel.bind("<Button-1>", lambda event, p=product,
-                       f=self.frame: self.select_product(p, f))
-
-            name_label = tk.Label(self.frame, text=product.name, wraplength=620,
-                                  font=('Arial', FONT_SIZE))
-            name_label.grid(row=0, column=1, sticky='w', columnspan=2)
-            name_label.bind("<Button-1>", lambda event, p=product,
-                            f=self.frame: self.select_product(p, f))
-
-            price_label = tk.Label(self.frame, text=f"价格: ¥{product.price}", font=(
-                'Arial', FONT_SIZE))
-            price_label.grid(row=0, column=3, sticky='e')
-            price_label.bind("<Button-1>", lambda event,
-                             p=product, f=self.frame: self.select_product(p, f))
-
-            row += 1
-
-    def select_product(self, product, frame):
-        if self.selected_panel is not None:
-            # Reset the previous selected panel's background
-            self.selected_panel.config(bg="white")
+        self.product_search.run()
+
+    @metrics.timed("ui.user.product_list")
+    def search_products(self, query, min_price, max_price, page, sort):
+        store = self.master.store
+        if query or min_price is not None or max_price is not None or sort:
+            total, products = store.search_products(
+                query, min_price, max_price, page, sort=sort)
+        else:
+            total, products = len(store.products), store.products
+        self.product_list.set_items(products)
+        self.selected_product = None
+        return total
 
+    def select_product(self, product):
         self.selected_product = product
-        self.selected_panel = frame
-        # Highlight the selected panel
-        self.selected_panel.config(bg="lightblue")
-
-        print(f"Selected product: {product.name}")
+        self.show_co_purchases(product)
+
+    def show_co_purchases(self, product):
+        for button in self.co_purchase_buttons:
+            button.destroy()
+        self.co_purchase_buttons = []
+        if product is None:
+            products = []
+        else:
+            with metrics.timer("ui.co_purchases"):
+                products = self.master.store.co_purchases(product)
+        for item in products[:CO_PURCHASES_SHOWN]:
+            button = tk.Button(
+                self.co_purchase_frame,
+                text=f"{item.name[:12]} ¥{format_price(item.price)}",
+                command=lambda item=item: self.pick_co_purchase(item))
+            button.pack(side="left", padx=2)
+            self.co_purchase_buttons.append(button)
+        if not self.co_purchase_buttons:
+            label = tk.Label(self.co_purchase_frame, text="暂无")
+            label.pack(side="left")
+            self.co_purchase_buttons.append(label)
+
+    def pick_co_purchase(self, product):
+        products = self.master.store.products
+        if not products.has(product.id):
+            # 商品已被删除，按钮随后会更新
+            self.show_co_purchases(self.selected_product)
+            return
+        if self.product_list.items is products:
+            # 显示全部商品时在列表中选中并滚动过去
+            position = products.position(product.id)
+            self.product_list.see(position)
+            self.product_list.select(position)
+        else:
+            self.product_list.refresh()
+            self.select_product(product)
 
 
 class AdminPanel(tk.Frame):
@@ -390,6 +385,10 @@ class AdminPanel(tk.Frame):
             button_label, text="删除商品", command=self.delete_product)
         self.del_product_btn.pack(side="left", padx=5, pady=5)
 
+        self.update_product_btn = tk.Button(
+            button_label, text="修改商品", command=self.update_product)
+        self.update_product_btn.pack(side="left", padx=5, pady=5)
+
         self.clear_product_btn = tk.Button(
             button_label, text="清空商品", command=self.clear_product)
         self.clear_product_btn.pack(side="left", padx=5, pady=5)
@@ -401,16 +400,115 @@ class AdminPanel(tk.Frame):
         # Center the button label
         button_label.grid_columnconfigure(0, weight=1)
 
+        self.product_search = SearchBar(
+            self.product_frame, self.search_products, font=self.default_font)
+        self.product_search.grid(row=3, column=0, columnspan=3, padx=5, pady=5)
+
+        self.shown_products = self.master.store.products
         self.product_list = tk.Listbox(self.product_frame, width=50, height=20)
-        self.product_list.grid(row=3, column=0, columnspan=3, padx=5, pady=5)
+        self.product_list.grid(row=4, column=0, columnspan=3, padx=5, pady=5)
         self.refresh_product_list()
 
+        # 之后的增删改由 store 的变更通知逐行同步
+        self.unsubscribe = self.master.store.subscribe(self.on_store_change)
+        self.bind("<Destroy>", self.on_destroy)
+
+        # 性能统计
+        self.stats_frame = tk.Frame(self.admin_notebook)
+        self.admin_notebook.add(self.stats_frame, text="性能统计")
+
+        self.stats_tree = ttk.Treeview(
+            self.stats_frame, columns=("count", "p50", "p95"), height=15)
+        self.stats_tree.heading("#0", text="项目")
+        self.stats_tree.heading("count", text="次数")
+        self.stats_tree.heading("p50", text="p50 (ms)")
+        self.stats_tree.heading("p95", text="p95 (ms)")
+        self.stats_tree.column("#0", width=260)
+        for column in ("count", "p50", "p95"):
+            self.stats_tree.column(column, width=100, anchor="e")
+        self.stats_tree.pack(padx=5, pady=5)
+        self.stats_label = tk.Label(self.stats_frame, justify="left")
+        self.stats_label.pack(padx=5, pady=5)
+        tk.Button(self.stats_frame, text="刷新",
+                  command=self.refresh_stats).pack(padx=5, pady=5)
+        self.admin_notebook.bind(
+            "<<NotebookTabChanged>>", lambda event: self.refresh_stats())
+
+    def on_destroy(self, event):
+        if event.widget is self:
+            self.unsubscribe()
+
+    def on_store_change(self, event, table, item, position):
+        if event == 'reload':
+            self.refresh_user_list()
+            self.refresh_product_list()
+            return
+        if table == 'users':
+            if event == 'insert':
+                self.user_list.insert(position, item)
+            elif event == 'delete':
+                self.user_list.delete(position)
+            return
+
+        products = self.master.store.products
+        if self.shown_products is products:
+            # 显示全部商品时，列表的行与 store.products 一一对应
+            if event == 'insert':
+                self.product_list.insert(position, self.product_text(item))
+            elif event == 'delete':
+                self.product_list.delete(position)
+            elif event == 'update':
+                self.product_list.delete(position)
+                self.product_list.insert(position, self.product_text(item))
+            elif event == 'clear':
+                self.product_list.delete(0, tk.END)
+            self.product_search.show_total(len(products))
+            return
+
+        # 显示搜索结果时只同步删除和修改，新增的商品重新查找后才会出现
+        if event == 'clear':
+            self.shown_products = []
+            self.product_list.delete(0, tk.END)
+            self.product_search.show_total(0)
+            return
+        row = next((i for i, product in enumerate(self.shown_products)
+                    if product.id == item.id), None)
+        if row is None:
+            return
+        if event == 'delete':
+            del self.shown_products[row]
+            self.product_list.delete(row)
+            self.product_search.show_total(self.product_search.total - 1)
+        elif event == 'update':
+            self.product_list.delete(row)
+            self.product_list.insert(row, self.product_text(item))
+
+    def refresh_stats(self):
+        self.stats_tree.delete(*self.stats_tree.get_children())
+        for name, count, p50, p95 in metrics.summary():
+            self.stats_tree.insert("", tk.END, text=name, values=(
+                count, f"{p50 * 1000:.1f}", f"{p95 * 1000:.1f}"))
+
+        lines = []
+        for name, label in (("http_cache", "HTTP 缓存"),
+                            ("thumbnail", "缩略图目录"),
+                            ("image_cache", "图片解码缓存")):
+            rate = metrics.hit_rate(name)
+            lines.append(f"{label}命中率：" +
+                         ("-" if rate is None else f"{rate:.0%}"))
+        orders, revenue = self.master.store.revenue()
+        lines.append(f"订单 {orders} 笔，营业额 ¥{format_price(revenue)}")
+        unpriced = self.master.store.unpriced_count()
+        if unpriced:
+            lines.append(f"价格无法识别的旧商品 {unpriced} 件，"
+                         "请在 unpriced_products 表中核对后重新添加")
+        self.stats_label.config(text="\n".join(lines))
+
     def clear_product(self):
-        products.clear()
-        self.refresh_product_list()
-        save_data()
+        self.master.store.clear_products()
 
     def close_search_window(self):
+        # 未完成的搜索会在后台继续执行，结果照常写入商品列表
         self.search_window.destroy()
 
     def create_search_window(self):
@@ -420,53 +518,103 @@ class AdminPanel(tk.Frame):
         self.search_window.protocol(
             "WM_DELETE_WINDOW", self.close_search_window)
 
-        self.search_label = tk.Label(self.search_window, text="关键字：")
+        self.search_label = tk.Label(
+            self.search_window, text="关键字（多个关键字用空格分隔）：")
         self.search_label.pack(padx=5, pady=5)
         self.search_entry = tk.Entry(
             self.search_window, font=self.default_font)
         self.search_entry.pack(padx=5, pady=5)
 
+        page_frame = tk.Frame(self.search_window)
+        page_frame.pack(padx=5, pady=5)
+        tk.Label(page_frame, text="页数：").pack(side="left")
+        self.page_spinbox = tk.Spinbox(page_frame, from_=1, to=50, width=5)
+        self.page_spinbox.delete(0, tk.END)
+        from pipeline import MAX_PAGES
+
+        self.page_spinbox.insert(0, MAX_PAGES)
+        self.page_spinbox.pack(side="left")
+
         self.search_button = tk.Button(
             self.search_window, text="搜索", command=self.search_product)
         self.search_button.pack(padx=5, pady=5)
 
-        self.refresh_product_list()
+        self.search_jobs = tk.Frame(self.search_window)
+        self.search_jobs.pack(fill="both", expand=True, padx=5, pady=5)
 
     def search_product(self):
-        asyncio.run(self.search_product_())
-
-    async def search_product_(self):
-        keyword = self.search_entry.get().strip()
-        if keyword:
-            try:
-                data = await get_product_data(keyword)
-                url = [i.get('image_url', None) for i in data]
-                title = [i.get('ad_title_text', None) for i in data if i]
-                price = [i.get('price', None) or i.get(
-                    'sku_price') or 0 for i in data if i]
-                tasks = [asyncio.create_task(load_image_async(i)) for i in url]
-                # as_completed(tasks)
-                for task in tqdm(asyncio.as_completed(tasks), total=len(tasks)):
-                    await task
-                image = [task.result() for task in tasks]
-                product_set = set(products)
-                for i in range(len(title)):
-                    product = Product(title[i], price[i], image[i])
-                    if product not in product_set:
-                        products.append(product)
-                self.refresh_product_list()
-                messagebox.showinfo("提示", "搜索完成", parent=self.search_window)
-                self.close_search_window()
-            except Exception as e:
-                messagebox.showerror(
-                    "错误", f"{e}, 无法获取数据", parent=self.search_window)
-        else:
+        keywords = self.search_entry.get().split()
+        if not keywords:
             messagebox.showerror("错误", "关键字不能为空", parent=self.search_window)
+            return
+        try:
+            max_pages = max(1, int(self.page_spinbox.get()))
+        except ValueError:
+            messagebox.showerror("错误", "页数必须是整数", parent=self.search_window)
+            return
+        self.search_entry.delete(0, tk.END)
+        for keyword in keywords:
+            self.start_search(keyword, max_pages)
+
+    def start_search(self, keyword, max_pages):
+        from pipeline import import_keyword
+
+        worker = self.master.worker
+        added = [0]
+
+        row = tk.Frame(self.search_jobs)
+        row.pack(fill="x", pady=2)
+        tk.Label(row, text=keyword, width=12, anchor="w").pack(side="left")
+        progress = ttk.Progressbar(row, length=400, mode="indeterminate")
+        progress.pack(side="left", padx=5)
+        progress.start()
+        status = tk.Label(row, text="搜索中...", width=16, anchor="w")
+        status.pack(side="left", padx=5)
+
+        # 以下回调在后台线程上调用，界面更新和写入商品交给 Tk 线程
+        def on_progress(done, total):
+            worker.call_in_ui(
+                self.update_search_progress, progress, status, done, total)
+
+        def on_batch(batch):
+            worker.call_in_ui(self.add_search_results, batch, added)
+
+        future = worker.submit(import_keyword(
+            keyword, on_batch, self.master.store.has_product, max_pages,
+            progress=on_progress))
+        cancel_button = tk.Button(row, text="取消", command=future.cancel)
+        cancel_button.pack(side="left", padx=5)
+        future.add_done_callback(lambda f: worker.call_in_ui(
+            self.finish_search, f, progress, status, cancel_button, added))
+
+    def update_search_progress(self, progress, status, done, total):
+        if not progress.winfo_exists():
+            return
+        if progress["mode"] != "determinate":
+            progress.stop()
+            progress.config(mode="determinate", maximum=total)
+        progress.config(value=done)
+        status.config(text=f"已处理 {done}/{total}")
+
+    def finish_search(self, future, progress, status, cancel_button, added):
+        if future.cancelled():
+            text = f"已取消，新增 {added[0]} 件"
+        elif future.exception() is not None:
+            text = f"{future.exception()}, 无法获取数据"
+        else:
+            text = f"完成，新增 {added[0]} 件"
+        if progress.winfo_exists():
+            progress.stop()
+            status.config(text=text)
+            cancel_button.config(state="disabled")
+
+    def add_search_results(self, results, added):
+        # 并发的搜索可能返回相同的商品，写入时再去重一次
+        added[0] += len(self.master.store.add_products(results))
 
     def refresh_user_list(self):
         self.user_list.delete(0, tk.END)
-        for user in users:
-            self.user_list.insert(tk.END, user)
+        self.user_list.insert(tk.END, *self.master.store.users)
 
     def create_user_window(self):
         self.user_window = tk.Toplevel(self)
@@ -501,34 +649,41 @@ class AdminPanel(tk.Frame):
             messagebox.showerror("错误", "用户名或密码不能为空", parent=self.user_window)
             return
         new_user = User(username, password)
-        if new_user in users:
+        if not self.master.store.add_user(new_user):
             messagebox.showerror("错误", "用户名已存在", parent=self.user_window)
         else:
-            users.append(new_user)
-            save_data()
-            self.refresh_user_list()
             messagebox.showinfo("提示", "用户已添加", parent=self.user_window)
             self.close_user_window()
 
     def delete_user(self):
         selection = self.user_list.curselection()
         if selection:
-            user_to_delete = users[selection[0]]
+            user_to_delete = self.master.store.users[selection[0]]
             if user_to_delete.username != "admin":
-                users.remove(user_to_delete)
-                print(users)
-                save_data()
-                self.refresh_user_list()
+                self.master.store.delete_user(user_to_delete)
                 messagebox.showinfo("提示", "用户已删除", parent=self)
             else:
                 messagebox.showerror("错误", "不能删除管理员账号", parent=self)
 
     def refresh_product_list(self):
-        save_data()
+        self.product_search.run()
+
+    @metrics.timed("ui.admin.product_list")
+    def search_products(self, query, min_price, max_price, page, sort):
+        store = self.master.store
+        if query or min_price is not None or max_price is not None or sort:
+            total, self.shown_products = store.search_products(
+                query, min_price, max_price, page, sort=sort)
+        else:
+            total, self.shown_products = len(store.products), store.products
         self.product_list.delete(0, tk.END)
-        for product in products:
-            self.product_list.insert(
-                tk.END, f"{product.name[:20]}... - 价格: ¥{product.price}")
+        self.product_list.insert(
+            tk.END, *map(self.product_text, self.shown_products))
+        return total
+
+    def product_text(self, product):
+        price = format_price(product.price)
+        return f"{product.name[:20]}... - 价格: ¥{price}"
 
     def add_product(self):
         title = self.title_entry.get().strip()
@@ -539,29 +694,69 @@ class AdminPanel(tk.Frame):
             messagebox.showerror("错误", "标题或价格不能为空", parent=self)
             return
 
+        try:
+            price = parse_price(price)
+        except ValueError as e:
+            messagebox.showerror("错误", str(e), parent=self)
+            return
+        if self.master.store.has_product(product_key(title, price)):
+            messagebox.showerror("错误", "商品已存在", parent=self)
+            return
+
         image_path = filedialog.askopenfilename()
         if not image_path:
             return
 
-        image = Image.open(image_path)
-        image.thumbnail((100, 100))
+        # 缩略图在进程池中生成，完成后回到 Tk 线程添加商品
+        worker = self.master.worker
+        future = get_executor().submit(
+            make_thumbnail, image_path, max_height=100)
+        future.add_done_callback(lambda f: worker.call_in_ui(
+            self.finish_add_product, f, title, price))
+
+    def finish_add_product(self, future, title, price):
+        try:
+            data = future.result()
+        except Exception as e:
+            messagebox.showerror("错误", f"{e}, 无法读取图片", parent=self)
+            return
+        key = image_store.put_bytes(image_key(data), data)
+        new_product = Product(title, price, key)
+        if not self.master.store.add_product(new_product):
+            messagebox.showerror("错误", "商品已存在", parent=self)
+            return
+        if self.winfo_exists():
+            messagebox.showinfo("提示", "商品已添加", parent=self)
 
-        price = float(price)
+    def update_product(self):
+        selection = self.product_list.curselection()
+        if not selection:
+            messagebox.showwarning("警告", "请选择一个商品", parent=self)
+            return
+        title = self.title_entry.get().strip()
+        price = self.price_entry.get().strip()
 
-        if title and price and image_path:
-            new_product = Product(title, price, image)
-            products.append(new_product)
-            save_data()
-            self.refresh_product_list()
-            messagebox.showinfo("提示", "商品已添加", parent=self)
+        # sanity check
+        if not title or not price:
+            messagebox.showerror("错误", "标题或价格不能为空", parent=self)
+            return
+
+        try:
+            price = parse_price(price)
+        except ValueError as e:
+            messagebox.showerror("错误", str(e), parent=self)
+            return
+        product = self.shown_products[selection[0]]
+        if not self.master.store.update_product(product, title, price):
+            messagebox.showerror("错误", "商品已存在", parent=self)
+            return
+        messagebox.showinfo("提示", "商品已修改", parent=self)
 
     def delete_product(self):
         selection = self.product_list.curselection()
         if selection:
-            product_to_delete = products[selection[0]]
-            products.remove(product_to_delete)
-            save_data()
-            self.refresh_product_list()
+            product_to_delete = self.shown_products[selection[0]]
+            self.master.store.delete_product(product_to_delete)
             messagebox.showinfo("提示", "商品已删除", parent=self)
 
 
@@ -572,8 +767,12 @@ class ShoppingSystem(tk.Tk):
         self.geometry("1000x800")
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
         self._frame = None  # Initialize the _frame attribute
+        self.store = open_store()  # 启动时只载入用户
+        self._worker = None
         self.switch_frame(MainApplication)
-        load_data()
+        # 登录窗口显示后再在后台准备商品目录
+        self.after_idle(self.store.preload_catalog)
+        self.after(CHANGE_POLL_INTERVAL, self.poll_changes)
 
         # Create a menu bar
         self.menu_bar = tk.Menu(self)
@@ -584,6 +783,15 @@ class ShoppingSystem(tk.Tk):
         self.menu_bar.add_cascade(label="User", menu=self.file_menu)
         self.file_menu.add_command(label="Logout", command=self.logout)
 
+    @property
+    def worker(self):
+        if self._worker is None:
+            from worker import AsyncWorker
+
+            self._worker = AsyncWorker()
+            self._worker.poll(self)
+        return self._worker
+
     def switch_frame(self, frame_class, *args):
         new_frame = frame_class(self, *args)
         if self._frame is not None:
@@ -591,14 +799,35 @@ class ShoppingSystem(tk.Tk):
         self._frame = new_frame
         self._frame.pack()
 
+    def poll_changes(self):
+        try:
+            self.store.poll_changes()
+        finally:
+            self.after(CHANGE_POLL_INTERVAL, self.poll_changes)
+
     def on_closing(self):
-        save_data()
-        self.destroy()
+        if self._worker is not None:
+            from net import close_fetcher
+
+            self._worker.stop(shutdown=close_fetcher)
+        shutdown_executor()
+        try:
+            # 等后台写入线程把未写入的修改提交；写入出错时也要关闭窗口
+            self.store.close()
+        finally:
+            metrics.close()
+            self.destroy()
 
     def logout(self):
         self.switch_frame(MainApplication)
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # 命令行模式，例如 python main.py import --keywords-file k.txt
+        from importer import main
+        sys.exit(main(sys.argv[1:]))
+
+    profile_from_env()
     app = ShoppingSystem()
     app.mainloop()
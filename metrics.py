@@ -0,0 +1,124 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from functools import wraps
+
+METRICS_LOG = 'metrics.log'  # 每次计时写一行 JSON
+SAMPLES = 1000  # 每项计时保留最近的样本数，用于计算分位数
+PROFILE_ENV = 'SHOP_PROFILE'  # 设为文件名时用 cProfile 记录 Tk 线程，退出时写入
+
+
+# 轻量的计时器和计数器，可以在任意线程上调用
+class Metrics:
+    def __init__(self, path=METRICS_LOG, samples=SAMPLES):
+        self.path = path
+        self.samples = samples
+        self.timers: dict[str, deque[float]] = {}
+        self.totals: dict[str, int] = defaultdict(int)  # 计时的累计次数
+        self.counters: dict[str, int] = defaultdict(int)
+        self._file = None
+        self._lock = threading.RLock()
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def observe(self, name, seconds, **fields):
+        with self._lock:
+            timer = self.timers.get(name)
+            if timer is None:
+                timer = self.timers[name] = deque(maxlen=self.samples)
+            timer.append(seconds)
+            self.totals[name] += 1
+            self._write({'time': time.time(), 'metric': name,
+                         'ms': round(seconds * 1000, 3), **fields})
+
+    @contextmanager
+    def timer(self, name, **fields):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **fields)
+
+    def timed(self, name):
+        # 装饰器，同时支持普通函数和协程函数
+        from inspect import iscoroutinefunction
+
+        def decorate(func):
+            if iscoroutinefunction(func):
+                @wraps(func)
+                async def wrapper(*args, **kwargs):
+                    with self.timer(name):
+                        return await func(*args, **kwargs)
+            else:
+                @wraps(func)
+                def wrapper(*args, **kwargs):
+                    with self.timer(name):
+                        return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def percentile(self, name, p):
+        with self._lock:
+            values = sorted(self.timers.get(name, ()))
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+    def summary(self):
+        # [(名称, 次数, p50 秒, p95 秒)]
+        return [(name, self.totals[name], self.percentile(name, 50),
+                 self.percentile(name, 95))
+                for name in sorted(self.timers)]
+
+    def hit_rate(self, name):
+        # 计数器 name.hit 和 name.miss 的命中率，没有数据时返回 None
+        hits = self.counters.get(f'{name}.hit', 0)
+        total = hits + self.counters.get(f'{name}.miss', 0)
+        return hits / total if total else None
+
+    def _write(self, record):
+        if self.path is None:
+            return
+        try:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self._file.flush()
+        except OSError:
+            self.path = None  # 日志写不进去时不影响程序运行
+
+    def close(self):
+        with self._lock:
+            if self.timers or self.counters:
+                self._write({'time': time.time(), 'metric': 'summary',
+                             'counters': dict(self.counters),
+                             'timers': {name: {
+                                 'count': self.totals[name],
+                                 'p50_ms': round(p50 * 1000, 3),
+                                 'p95_ms': round(p95 * 1000, 3)}
+                                 for name, _, p50, p95 in self.summary()}})
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def profile_from_env():
+    # SHOP_PROFILE=profile.out python main.py，之后用 pstats 或 snakeviz 查看
+    path = os.environ.get(PROFILE_ENV)
+    if not path:
+        return None
+    import atexit
+    import cProfile
+
+    profiler = cProfile.Profile()
+    atexit.register(profiler.dump_stats, path)
+    profiler.enable()
+    return profiler
+
+
+metrics = Metrics()
@@ -0,0 +1,106 @@
+import re
+import unicodedata
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from images import image_store
+
+_PRICE_JUNK = re.compile(r"[\s,，¥￥元]")
+
+
+def parse_price(value, default=None):
+    # 抓取到的字符串、手工输入的数字和旧数据中的价格统一换算为整数分，
+    # 按四舍五入保留到分；无法解析时返回 default，未给出 default 则抛出 ValueError
+    if isinstance(value, str):
+        value = _PRICE_JUNK.sub("", unicodedata.normalize("NFKC", value))
+    try:
+        cents = (Decimal(str(value)) * 100).quantize(
+            Decimal(1), ROUND_HALF_UP)
+        if not cents.is_finite() or cents < 0:
+            cents = None
+    except (InvalidOperation, ValueError):
+        cents = None
+    if cents is None:
+        if default is None:
+            raise ValueError(f"价格格式错误：{value}")
+        return default
+    return int(cents)
+
+
+def format_price(cents):
+    return f"{cents // 100}.{cents % 100:02d}"
+
+
+def product_key(name, price, sku=None):
+    # 商品去重用的标识：优先使用京东的 SKU，否则使用规范化后的标题和价格（分）
+    if sku:
+        return f"sku:{sku}"
+    name = re.sub(r"\s+", " ", unicodedata.normalize("NFKC", name or ""))
+    return f"t:{name.strip().casefold()}|{format_price(price)}"
+
+
+class Product:
+    __slots__ = ('id', 'name', 'price', 'image_key', 'sku')
+
+    def __init__(self, name, price, image_key=None, id=None, sku=None):
+        self.id = id
+        self.name = name
+        self.price = price  # 整数分，由 parse_price 在导入时换算
+        self.image_key = image_key
+        self.sku = sku
+
+    @property
+    def key(self):
+        return product_key(self.name, self.price, self.sku)
+
+    @property
+    def image(self):
+        # 图片按需从缩略图目录解码
+        if self.image_key is None:
+            return None
+        return image_store.get(self.image_key)
+
+    def __repr__(self):
+        return f"<Goods {self.name}>"
+
+    def __eq__(self, value: object) -> bool:
+        return isinstance(value, Product) and self.key == value.key
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+
+class User:
+    __slots__ = ('username', 'password', 'cart', 'cart_total', 'role')
+
+    def __init__(self, username, password):
+        self.username = username
+        self.password = password
+        self.cart = None  # 商品 id -> 数量，由 Store.get_cart 按需读取
+        self.cart_total = 0  # 购物车总额（分），随增删商品更新
+        self.role = "user"
+
+    def __eq__(self, value: object) -> bool:
+        return self.username == value.username
+
+    def __repr__(self) -> str:
+        return f"<User {self.username}>"
+
+    def add_to_cart(self, product, quantity=1):
+        # 先读出价格，商品已被删除时购物车保持不变
+        self.cart_total += product.price * quantity
+        self.cart[product.id] = self.cart.get(product.id, 0) + quantity
+
+    def remove_from_cart(self, product):
+        self.cart_total -= product.price * self.cart.pop(product.id, 0)
+
+    def clear_cart(self):
+        self.cart = {}
+        self.cart_total = 0
+
+
+class Admin(User):
+    __slots__ = ()
+
+    def __init__(self, username, password):
+        super().__init__(username, password)
+        self.role = "admin"
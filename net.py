@@ -0,0 +1,173 @@
+import asyncio
+import json
+import random
+
+import httpx
+
+from httpcache import http_cache
+from images import get_executor, image_key, image_store, make_thumbnail
+from metrics import metrics
+
+try:
+    import h2  # noqa: F401
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+SEARCH_URL = 'https://re.jd.com/search'
+IMAGE_URL = 'http://img13.360buyimg.com/n1/'
+
+CONCURRENCY = 16  # 同时进行的请求数
+TIMEOUT = 10.0
+RETRIES = 3
+BACKOFF = 0.5
+RETRY_STATUS = {429, 500, 502, 503, 504}
+TRANSPORT = None  # 基准测试中替换为本地模拟的 httpx 传输层
+
+PAGE_DATA_MARKER = b'var pageData = '
+
+
+# 共享连接池的 HTTP 客户端，限制并发数，失败时按指数退避重试
+# 传入 cache 时 GET 结果会缓存在磁盘上，过期后发条件请求
+class Fetcher:
+    def __init__(self, concurrency=CONCURRENCY, timeout=TIMEOUT,
+                 retries=RETRIES, backoff=BACKOFF, transport=None,
+                 cache=None):
+        self.cache = cache
+        self.retries = retries
+        self.backoff = backoff
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.client = httpx.AsyncClient(
+            http2=HTTP2,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=concurrency,
+                                max_keepalive_connections=concurrency),
+            follow_redirects=True,
+            transport=transport)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def get(self, url, params=None):
+        url = str(httpx.URL(url, params=params))
+        if self.cache is None:
+            return await self._request(url)
+
+        entry = self.cache.get(url)
+        if entry is not None and entry.fresh(self.cache.ttl):
+            metrics.count('http_cache.hit')
+            return entry.response()
+
+        response = await self._request(
+            url, entry.validators() if entry is not None else None)
+        if response.status_code == 304 and entry is not None:
+            metrics.count('http_cache.hit')
+            metrics.count('http_cache.revalidated')
+            self.cache.touch(entry)
+            return entry.response()
+        metrics.count('http_cache.miss')
+        if response.status_code == 200:
+            self.cache.put(url, response)
+        return response
+
+    async def _request(self, url, headers=None):
+        attempt = 0
+        while True:
+            try:
+                async with self.semaphore:
+                    response = await self.client.get(url, headers=headers)
+                if response.status_code not in RETRY_STATUS \
+                        or attempt >= self.retries:
+                    return response
+            except httpx.TransportError:
+                if attempt >= self.retries:
+                    raise
+            await asyncio.sleep(
+                self.backoff * 2 ** attempt * (0.5 + random.random()))
+            attempt += 1
+
+
+_fetcher = None
+_fetcher_loop = None
+
+
+def get_fetcher():
+    # httpx 的连接绑定在事件循环上，每个事件循环各用一个 Fetcher
+    global _fetcher, _fetcher_loop
+    loop = asyncio.get_running_loop()
+    if _fetcher is None or _fetcher_loop is not loop:
+        _fetcher = Fetcher(concurrency=CONCURRENCY, transport=TRANSPORT,
+                           cache=http_cache)
+        _fetcher_loop = loop
+    return _fetcher
+
+
+async def close_fetcher():
+    global _fetcher, _fetcher_loop
+    if _fetcher is not None:
+        await _fetcher.aclose()
+    _fetcher = _fetcher_loop = None
+
+
+@metrics.timed('net.load_image')
+async def load_image_async(image_url, fetcher=None):
+    # 缩略图以 URL 哈希为键保存，已经下载过的图片直接复用
+    key = image_key(image_url)
+    if image_store.exists(key):
+        metrics.count('thumbnail.hit')
+        return key
+    metrics.count('thumbnail.miss')
+    fetcher = fetcher or get_fetcher()
+    response = await fetcher.get(IMAGE_URL + image_url)
+    response.raise_for_status()
+    loop = asyncio.get_running_loop()
+    with metrics.timer('image.resize'):
+        data = await loop.run_in_executor(
+            get_executor(), make_thumbnail, response.content)
+    return image_store.put_bytes(key, data)
+
+
+@metrics.timed('net.get_product_data')
+async def get_product_data(keyword, page=1, fetcher=None):
+    fetcher = fetcher or get_fetcher()
+    params = {'keyword': keyword, 'enc': 'utf-8'}
+    if page > 1:
+        params['page'] = page
+    response = await fetcher.get(SEARCH_URL, params=params)
+    response.raise_for_status()
+    data = extract_page_data(response.content, response.encoding)
+    if data is None:
+        data = extract_page_data_soup(response.text)
+    return data.get('result', [])
+
+
+def extract_page_data(content, encoding='utf-8'):
+    # 直接在响应字节中定位 pageData，只解码和解析这一段 JSON
+    start = content.find(PAGE_DATA_MARKER)
+    if start < 0:
+        return None
+    start += len(PAGE_DATA_MARKER)
+    end = content.find(b'</script>', start)
+    text = content[start:end if end >= 0 else len(content)].decode(
+        encoding or 'utf-8', errors='replace')
+    try:
+        data, _ = json.JSONDecoder().raw_decode(text.lstrip())
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def extract_page_data_soup(text):
+    # 页面结构变化时的后备方案：完整解析 HTML
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(text, 'html.parser')
+    scripts = soup.find_all('script', type='text/javascript')
+    data = scripts[1].text.strip().split('var pageData = ')[-1][:-1]
+    return json.loads(data)
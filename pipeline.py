@@ -0,0 +1,124 @@
+import asyncio
+from contextlib import aclosing
+
+import httpx
+
+from models import Product, parse_price
+from net import get_product_data, load_image_async
+
+MAX_PAGES = 5  # 每个关键字最多抓取的搜索结果页数
+IMAGE_TASKS = 16  # 同时处理缩略图的任务数
+QUEUE_SIZE = 64  # 等待下载缩略图的商品数上限，限制峰值内存
+BATCH_SIZE = 30
+BATCH_INTERVAL = 0.2  # 秒，未攒满一批时也按此间隔提交
+
+
+def product_from_item(item):
+    # 价格在这里一次性换算为分；没有标题或价格无法解析时抛出 ValueError
+    name = item.get('ad_title_text')
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError('商品没有标题')
+    return Product(name,
+                   parse_price(item.get('price') or item.get('sku_price')),
+                   sku=item.get('sku_id') or item.get('sku'))
+
+
+async def iter_search_items(keyword, max_pages=MAX_PAGES):
+    # 各页并发请求，哪一页先返回就先产出哪一页的商品；
+    # 个别页面失败时跳过，全部失败才抛出异常
+    tasks = [asyncio.create_task(get_product_data(keyword, page))
+             for page in range(1, max_pages + 1)]
+    errors = []
+    try:
+        for task in asyncio.as_completed(tasks):
+            try:
+                items = await task
+            except (httpx.HTTPError, ValueError, IndexError) as e:
+                errors.append(e)
+                continue
+            for item in items:
+                if item:
+                    yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+    if len(errors) == len(tasks):
+        raise errors[0]
+
+
+class ImportStats:
+    def __init__(self):
+        self.found = 0
+        self.skipped = 0
+        self.failed = 0
+        self.imported = 0
+
+
+# 搜索 -> 去重 -> 缩略图 -> 分批提交 的流式导入
+# on_batch(products) 在事件循环线程上调用，exists(key) 判断商品是否已存在
+async def import_keyword(keyword, on_batch, exists=None, max_pages=MAX_PAGES,
+                         max_items=None, progress=None,
+                         batch_size=BATCH_SIZE):
+    stats = ImportStats()
+    queue = asyncio.Queue(QUEUE_SIZE)
+    batch = []
+
+    def flush():
+        if batch:
+            stats.imported += len(batch)
+            on_batch(batch[:])
+            batch.clear()
+
+    async def dedup():
+        seen = set()
+        async with aclosing(iter_search_items(keyword, max_pages)) as items:
+            async for item in items:
+                try:
+                    product = product_from_item(item)
+                except ValueError:
+                    stats.skipped += 1
+                    continue
+                if product.key in seen or (exists and exists(product.key)):
+                    stats.skipped += 1
+                    continue
+                seen.add(product.key)
+                stats.found += 1
+                await queue.put((product, item.get('image_url')))
+                if max_items and stats.found >= max_items:
+                    break
+        for _ in range(IMAGE_TASKS):
+            await queue.put(None)
+
+    async def thumbnail():
+        while (job := await queue.get()) is not None:
+            product, image_url = job
+            try:
+                product.image_key = await load_image_async(image_url)
+            except (httpx.HTTPError, OSError, ValueError, TypeError):
+                # 单张图片失败不影响其余商品
+                stats.failed += 1
+            else:
+                batch.append(product)
+                if len(batch) >= batch_size:
+                    flush()
+            if progress is not None:
+                progress(stats.imported + len(batch) + stats.failed,
+                         stats.found)
+
+    async def ticker():
+        while True:
+            await asyncio.sleep(BATCH_INTERVAL)
+            flush()
+
+    ticker_task = asyncio.create_task(ticker())
+    tasks = [asyncio.create_task(dedup())]
+    tasks += [asyncio.create_task(thumbnail()) for _ in range(IMAGE_TASKS)]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        ticker_task.cancel()
+        for task in tasks:
+            task.cancel()
+        # 出错或被取消时，已经处理好的商品照常提交
+        flush()
+    return stats
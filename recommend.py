@@ -0,0 +1,81 @@
+import heapq
+import math
+import sqlite3
+import time
+from collections import Counter, defaultdict
+from itertools import combinations, groupby
+from operator import itemgetter
+
+from metrics import metrics
+from store import BUSY_TIMEOUT, DB_PATH
+
+TOP_K = 10  # 每件商品保留的相关商品数
+MIN_SUPPORT = 2  # 至少一起出现在这么多个订单中才算相关
+SCORE = 'cosine'  # 'cosine' 或 'lift'
+MAX_BASKET = 50  # 商品更多的订单只统计单品，两两组合数随商品数平方增长
+
+
+def co_occurrence(baskets, top_k=TOP_K, score=SCORE, min_support=MIN_SUPPORT):
+    # baskets 是每个订单中的商品 id；
+    # 返回 {商品 id: [(分数, 相关商品 id)]}，按分数从高到低
+    items_bought = []
+    pairs = []
+    orders = 0
+    for basket in baskets:
+        items = sorted(set(basket))
+        orders += 1
+        items_bought += items
+        if 1 < len(items) <= MAX_BASKET:
+            pairs += [a << 32 | b for a, b in combinations(items, 2)]
+    # 两个 id 拼成一个整数作为键，由 Counter 在 C 层一次计数，
+    # 比逐个订单更新嵌套字典快得多；结果本身就是稀疏的共现矩阵
+    item_counts = Counter(items_bought)
+    pair_counts = Counter(pairs)
+    del items_bought, pairs
+
+    neighbors = defaultdict(list)
+    for pair, count in pair_counts.items():
+        if count < min_support:
+            continue
+        a, b = pair >> 32, pair & 0xFFFFFFFF
+        if score == 'lift':
+            value = count * orders / (item_counts[a] * item_counts[b])
+        else:
+            value = count / math.sqrt(item_counts[a] * item_counts[b])
+        neighbors[a].append((value, b))
+        neighbors[b].append((value, a))
+    return {id: heapq.nlargest(top_k, items)
+            for id, items in neighbors.items()}
+
+
+def rebuild(path=DB_PATH, top_k=TOP_K, score=SCORE):
+    # 由全部订单重建 co_purchases 表，返回有推荐的商品数；使用单独的连接，
+    # 可以在进程池或命令行中运行
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+    try:
+        with metrics.timer('recommend.rebuild'):
+            last_order = conn.execute(
+                'SELECT COALESCE(MAX(id), 0) FROM orders').fetchone()[0]
+            rows = conn.execute(
+                'SELECT order_id, product_id FROM order_items '
+                'WHERE order_id <= ? ORDER BY order_id', (last_order,))
+            baskets = ([product_id for _, product_id in group]
+                       for _, group in groupby(rows, itemgetter(0)))
+            neighbors = co_occurrence(baskets, top_k, score)
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.execute('DELETE FROM co_purchases')
+                conn.execute('DELETE FROM co_purchase_builds')
+                conn.executemany(
+                    'INSERT INTO co_purchases '
+                    '(product_id, rank, neighbor_id, score) '
+                    'VALUES (?, ?, ?, ?)',
+                    ((id, rank, neighbor, value)
+                     for id, items in neighbors.items()
+                     for rank, (value, neighbor) in enumerate(items)))
+                conn.execute(
+                    'INSERT INTO co_purchase_builds (last_order, created) '
+                    'VALUES (?, ?)', (last_order, time.time()))
+        return len(neighbors)
+    finally:
+        conn.close()
@@ -0,0 +1,122 @@
+import heapq
+import math
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left
+
+PAGE_SIZE = 50
+
+_TOKEN_RE = re.compile(
+    r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[a-z0-9]+(?:\.[0-9]+)?')
+
+
+def tokenize(text, unigrams=False):
+    # 中文按相邻两字切分（单字保留），英文和数字按整词；
+    # 建索引时 unigrams 为真，另外加入每个汉字，只输入一个字也能查到
+    text = unicodedata.normalize('NFKC', text or '').casefold()
+    tokens = []
+    for run in _TOKEN_RE.findall(text):
+        if run[0].isascii():
+            tokens.append(run)
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            if unigrams:
+                tokens.extend(run)
+    return tokens
+
+
+# 商品标题的倒排索引，每个词对应一个按 id 递增的数组，随商品增删增量更新；
+# 价格筛选和排序直接使用商品目录按价格排好序的列
+class CatalogIndex:
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.postings: dict[str, array] = {}
+
+    def __len__(self):
+        return len(self.catalog)
+
+    def _add(self, id, name):
+        for token in set(tokenize(name, unigrams=True)):
+            ids = self.postings.get(token)
+            if ids is None:
+                ids = self.postings[token] = array('q')
+            if ids and id < ids[-1]:
+                ids.insert(bisect_left(ids, id), id)
+            else:
+                ids.append(id)
+
+    def add(self, product):
+        self._add(product.id, product.name)
+
+    def add_all(self):
+        # 为整个商品目录建立索引
+        for id, name in zip(self.catalog.ids, self.catalog.names):
+            self._add(id, name)
+
+    def remove(self, product):
+        # 需要在商品目录中删除或修改这个商品之前调用
+        for token in set(tokenize(product.name, unigrams=True)):
+            ids = self.postings.get(token)
+            if ids is None:
+                continue
+            position = bisect_left(ids, product.id)
+            if position < len(ids) and ids[position] == product.id:
+                del ids[position]
+            if not ids:
+                del self.postings[token]
+
+    def clear(self):
+        self.postings.clear()
+
+    def search(self, query='', min_price=None, max_price=None,
+               page=0, page_size=PAGE_SIZE, sort=None):
+        # 返回 (匹配总数, 当前页的商品 id)；价格单位为分，
+        # sort 为 'price' / '-price' 时按价格升序 / 降序，否则按相关度
+        start, stop = page * page_size, (page + 1) * page_size
+
+        query_tokens = set(tokenize(query))
+        if not query_tokens:
+            # 只按价格筛选：直接截取按价格排序的 id
+            ids = self.catalog.price_range(min_price, max_price)
+            if sort == '-price':
+                ids = ids[::-1]
+            return len(ids), list(ids[start:stop])
+
+        # 包含全部查询词的商品排在前面（按 id），其余只命中部分词的商品
+        # 按命中词的 IDF 之和排序；集合运算都在 C 层完成
+        postings = [self.postings.get(token, ()) for token in query_tokens]
+        postings.sort(key=len)
+        exact = set(postings[0]).intersection(*postings[1:])
+        matched = set().union(*postings)
+        if min_price is not None or max_price is not None:
+            in_range = set(self.catalog.price_range(min_price, max_price))
+            exact &= in_range
+            matched &= in_range
+        if sort in ('price', '-price'):
+            ids = self.catalog.sort_by_price(matched, sort == '-price')
+            return len(matched), ids[start:stop]
+
+        ids = heapq.nsmallest(stop, exact)
+        if len(ids) < stop:
+            # 出现在一半以上商品中的词区分度很低，只命中这类词的商品按 id 排在最后，
+            # 不逐个计分
+            total = len(self.catalog) or 1
+            scores: dict[int, float] = {}
+            for token in query_tokens:
+                token_ids = self.postings.get(token)
+                if not token_ids or len(token_ids) * 2 > total:
+                    continue
+                weight = math.log(1 + total / len(token_ids))
+                for id in token_ids:
+                    if id in matched and id not in exact:
+                        scores[id] = scores.get(id, 0) + weight
+            ids += [id for id, _ in heapq.nsmallest(
+                stop - len(ids), scores.items(),
+                key=lambda item: (-item[1], item[0]))]
+            if len(ids) < stop:
+                rest = matched - exact - scores.keys()
+                ids += heapq.nsmallest(stop - len(ids), rest)
+        return len(matched), ids[start:stop]
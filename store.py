@@ -0,0 +1,1000 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import traceback
+from io import BytesIO
+
+from images import image_store
+from catalog import Catalog
+from index import OrderedIndex
+from metrics import metrics
+from models import Admin, Product, User, parse_price, product_key
+from search import PAGE_SIZE, CatalogIndex
+
+DB_PATH = 'data.db'
+LEGACY_PATH = 'data.pkl'
+# 'batched'：界面操作的修改交给后台线程，FLUSH_WINDOW 内的修改合并为一个事务；
+# 'immediate'：每次修改都在调用线程上同步提交
+DURABILITY = 'batched'
+FLUSH_WINDOW = 0.2  # 秒
+BUSY_TIMEOUT = 10  # 秒，其他进程正在写入时等待的时间
+WRITE_RETRY_DELAY = 0.05  # 秒，后台写入遇到锁时第一次重试前的等待，之后加倍
+WRITE_RETRY_MAX_DELAY = 1  # 秒
+WRITE_RETRIES = 5  # 每次还要先等 BUSY_TIMEOUT，仍然拿不到写锁就放弃这一批
+CHANGE_LOG_TTL = 24 * 3600  # 秒，变更日志保留的时间
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL,
+    role TEXT NOT NULL DEFAULT 'user'
+);
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    price INTEGER NOT NULL,
+    image_key TEXT,
+    sku TEXT,
+    key TEXT
+);
+CREATE INDEX IF NOT EXISTS products_image_key ON products(image_key);
+CREATE TABLE IF NOT EXISTS cart_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL REFERENCES users(username) ON DELETE CASCADE,
+    product_id INTEGER NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+    quantity INTEGER NOT NULL DEFAULT 1,
+    UNIQUE (username, product_id)
+);
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    created REAL NOT NULL,
+    total INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS orders_username ON orders(username);
+CREATE TABLE IF NOT EXISTS order_items (
+    order_id INTEGER NOT NULL REFERENCES orders(id) ON DELETE CASCADE,
+    product_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    price INTEGER NOT NULL,
+    quantity INTEGER NOT NULL,
+    PRIMARY KEY (order_id, product_id)
+);
+CREATE TABLE IF NOT EXISTS co_purchases (
+    product_id INTEGER NOT NULL,
+    rank INTEGER NOT NULL,
+    neighbor_id INTEGER NOT NULL,
+    score REAL NOT NULL,
+    PRIMARY KEY (product_id, rank)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS co_purchase_builds (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    last_order INTEGER NOT NULL,
+    created REAL NOT NULL
+);
+-- 迁移旧数据时价格无法识别的商品，不能当作 0 元出售，留给管理员核对后重新添加
+CREATE TABLE IF NOT EXISTS unpriced_products (
+    old_id INTEGER,
+    name TEXT,
+    price,
+    image_key TEXT,
+    sku TEXT
+);
+"""
+
+# 变更日志：触发器记录每一行用户、商品和购物车的修改，不论来自哪个进程；
+# 其他进程按 seq 增量读取，只重新读取变化的行。商品表重建后触发器需要重建，
+# 所以在迁移之后执行
+CHANGE_LOG = """
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    created INTEGER NOT NULL DEFAULT (strftime('%s', 'now')),
+    tbl TEXT NOT NULL,
+    key TEXT NOT NULL
+);
+""" + "".join(f"""
+CREATE TRIGGER IF NOT EXISTS {table}_{event}_log AFTER {event.upper()} ON {table}
+BEGIN
+    INSERT INTO changes (tbl, key) VALUES ('{table}', {row}.{key});
+END;
+""" for table, key in (('users', 'username'), ('products', 'id'),
+                       ('cart_items', 'username'))
+    for event, row in (('insert', 'NEW'), ('update', 'NEW'),
+                       ('delete', 'OLD')))
+
+
+# 用户、商品、购物车的持久化仓库，每次修改只写入受影响的行；
+# 多个进程可以同时打开同一个数据库，用 poll_changes 同步其他进程的修改
+class Store:
+    def __init__(self, path=DB_PATH, durability=DURABILITY):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+        # WAL 模式下读写互不阻塞，写入只需等其他进程的写事务
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        self.conn.executescript(SCHEMA)
+        self._migrate_products_table()
+        self._migrate_image_table()
+        self._migrate_product_keys()
+        self._migrate_cart_table()
+        self.conn.executescript(CHANGE_LOG)
+        with self.conn:
+            self.conn.execute('DELETE FROM changes WHERE created < ?',
+                              (int(time.time()) - CHANGE_LOG_TTL,))
+        # 之后的变更由 poll_changes 读取；重复应用已经载入的修改没有影响
+        self.change_seq = self.conn.execute(
+            'SELECT COALESCE(MAX(seq), 0) FROM changes').fetchone()[0]
+        self.users = OrderedIndex(lambda user: user.username)
+        # 商品 id -> 已载入的购物车中有这件商品的用户名，改价和删除商品时
+        # 只更新这些购物车，不必遍历所有用户
+        self.cart_owners: dict[int, set[str]] = {}
+        # 商品目录（商品、去重标识和搜索索引）在第一次用到时才载入，
+        # 或者由 preload_catalog 在后台线程上提前准备好
+        self._catalog = None
+        self._preload = None
+        self._preloaded = None
+        self._co_purchase_job = None
+        self._co_purchase_executor = None
+        self.listeners = []
+        self.load_users()
+        self.writer = _Writer(path) if durability == 'batched' else None
+
+    def _migrate_image_table(self):
+        # 早期版本把图片存在 images 表中，迁移到缩略图目录
+        if not self.conn.execute(
+                "SELECT 1 FROM sqlite_master "
+                "WHERE type = 'table' AND name = 'images'").fetchone():
+            return
+        from PIL import Image
+
+        for key, data in self.conn.execute('SELECT key, data FROM images'):
+            image_store.put(Image.open(BytesIO(data)), key)
+        # 商品表已由 _migrate_products_table 去掉对 images 的引用，
+        # 仍然关闭外键，以免其他残留的引用让删除失败
+        self.conn.execute('PRAGMA foreign_keys = OFF')
+        try:
+            with self.conn:
+                self.conn.execute('DROP TABLE images')
+        finally:
+            self.conn.execute('PRAGMA foreign_keys = ON')
+
+    def _migrate_products_table(self):
+        # 早期版本的价格是字符串或浮点数，统一换算为整数分；最早的版本中
+        # image_key 还引用 images 表，这个表迁移后会被删除。SQLite 不能修改列的
+        # 类型和约束，按官方的步骤重建商品表，要在其他迁移写入商品表之前执行
+        columns = {row[1]: row[2] for row in self.conn.execute(
+            'PRAGMA table_info(products)')}
+        sql = self.conn.execute(
+            "SELECT sql FROM sqlite_master "
+            "WHERE type = 'table' AND name = 'products'").fetchone()[0]
+        cents = columns['price'] == 'INTEGER'
+        if cents and 'REFERENCES images' not in sql:
+            return
+        sku = 'sku' if 'sku' in columns else 'NULL'
+        rows = []
+        unpriced = []
+        for id, name, price, image_key, sku in self.conn.execute(
+                f'SELECT id, name, price, image_key, {sku} FROM products'):
+            if not cents:
+                try:
+                    price = parse_price(price)
+                except ValueError:
+                    unpriced.append((id, name, price, image_key, sku))
+                    continue
+            rows.append((id, name, price, image_key, sku,
+                         product_key(name, price, sku)))
+        carts = [table for table in ('cart', 'cart_items')
+                 if self.conn.execute(
+                     "SELECT 1 FROM sqlite_master "
+                     "WHERE type = 'table' AND name = ?", (table,)).fetchone()]
+        # 重建期间暂时关闭外键，否则删除旧表会级联删除购物车
+        self.conn.execute('PRAGMA foreign_keys = OFF')
+        try:
+            with self.conn:
+                self.conn.execute('BEGIN')
+                self.conn.execute("""
+                    CREATE TABLE products_new (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        name TEXT NOT NULL,
+                        price INTEGER NOT NULL,
+                        image_key TEXT,
+                        sku TEXT,
+                        key TEXT
+                    )""")
+                self.conn.executemany(
+                    'INSERT INTO products_new '
+                    '(id, name, price, image_key, sku, key) '
+                    'VALUES (?, ?, ?, ?, ?, ?)', rows)
+                self.conn.execute('DROP TABLE products')
+                self.conn.execute(
+                    'ALTER TABLE products_new RENAME TO products')
+                self.conn.execute(
+                    'CREATE INDEX products_image_key ON products(image_key)')
+                if unpriced:
+                    self.conn.executemany(
+                        'INSERT INTO unpriced_products '
+                        '(old_id, name, price, image_key, sku) '
+                        'VALUES (?, ?, ?, ?, ?)', unpriced)
+                    for table in carts:
+                        self.conn.execute(
+                            f'DELETE FROM {table} WHERE product_id '
+                            'NOT IN (SELECT id FROM products)')
+        finally:
+            self.conn.execute('PRAGMA foreign_keys = ON')
+        if unpriced:
+            # 管理员在“性能统计”中看到数量，见 unpriced_count
+            metrics.count('store.unpriced_products', len(unpriced))
+
+    def _migrate_product_keys(self):
+        columns = {row[1] for row in self.conn.execute(
+            'PRAGMA table_info(products)')}
+        with self.conn:
+            for column in ('sku', 'key'):
+                if column not in columns:
+                    self.conn.execute(
+                        f'ALTER TABLE products ADD COLUMN {column} TEXT')
+            rows = self.conn.execute(
+                'SELECT id, name, price, sku FROM products WHERE key IS NULL'
+            ).fetchall()
+            self.conn.executemany(
+                'UPDATE products SET key = ? WHERE id = ?',
+                [(product_key(name, price, sku), id)
+                 for id, name, price, sku in rows])
+            self.conn.execute(
+                'CREATE INDEX IF NOT EXISTS products_key ON products(key)')
+
+    def _migrate_cart_table(self):
+        # 早期版本的购物车每件商品一行，合并为带数量的条目
+        if not self.conn.execute(
+                "SELECT 1 FROM sqlite_master "
+                "WHERE type = 'table' AND name = 'cart'").fetchone():
+            return
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR IGNORE INTO cart_items '
+                '(username, product_id, quantity) '
+                'SELECT username, product_id, COUNT(*) FROM cart '
+                'GROUP BY username, product_id ORDER BY MIN(id)')
+            self.conn.execute('DROP TABLE cart')
+
+    def load_users(self):
+        # 登录界面只需要用户索引
+        with metrics.timer('store.load_users'):
+            self.users.clear()
+            self.cart_owners.clear()
+            for username, password, role in self.conn.execute(
+                    'SELECT username, password, role FROM users '
+                    'ORDER BY rowid'):
+                cls = Admin if role == 'admin' else User
+                self.users.add(cls(username, password))
+
+    def preload_catalog(self):
+        if self._catalog is not None or self._preload is not None:
+            return
+
+        def run():
+            from urllib.request import pathname2url
+
+            # sqlite 连接不能跨线程使用，后台线程单独打开一个只读连接
+            uri = f'file:{pathname2url(os.path.abspath(self.path))}?mode=ro'
+            conn = sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT)
+            try:
+                with metrics.timer('store.preload_catalog'):
+                    self._preloaded = _read_catalog(conn)
+            except sqlite3.Error:
+                pass  # 交给 ensure_catalog 在主线程上重新载入
+            finally:
+                conn.close()
+
+        self._preload = threading.Thread(
+            target=run, name='catalog-preload', daemon=True)
+        self._preload.start()
+
+    def ensure_catalog(self):
+        if self._catalog is None:
+            # 包括等待后台载入完成的时间
+            with metrics.timer('store.load_catalog'):
+                if self._preload is not None:
+                    self._preload.join()
+                    self._preload = None
+                catalog = self._preloaded or _read_catalog(self.conn)
+                self._preloaded = None
+                self._catalog = catalog
+        return self._catalog
+
+    @property
+    def products(self):
+        return self.ensure_catalog()[0]
+
+    @property
+    def key_counts(self) -> dict[str, int]:
+        return self.ensure_catalog()[1]  # 去重标识 -> 商品数
+
+    @property
+    def search_index(self):
+        return self.ensure_catalog()[2]
+
+    def _write(self, *statements):
+        # 一次修改的全部 (sql, 参数)，在同一个事务中写入；内存中的数据已经更新
+        if self.writer is None:
+            with self.conn:
+                for sql, params in statements:
+                    self.conn.execute(sql, params)
+        else:
+            self.writer.submit(statements)
+
+    def flush(self):
+        # 等待后台线程写完已提交的修改；之后在 self.conn 上的读写能看到这些修改
+        if self.writer is not None:
+            self.writer.flush()
+
+    def writes_pending(self):
+        return self.writer is not None and self.writer.busy()
+
+    def close(self):
+        try:
+            if self._co_purchase_executor is not None:
+                # 正在进行的重建在自己的事务中提交或放弃，不必等它完成
+                self._co_purchase_executor.shutdown(
+                    wait=False, cancel_futures=True)
+                self._co_purchase_executor = None
+            if self.writer is not None:
+                self.writer.close()
+        finally:
+            self.conn.close()
+
+    # 其他进程的修改
+    def poll_changes(self):
+        # 读取上次之后的变更日志，逐行对照数据库更新内存中的数据并发出变更通知，
+        # 返回变化的行数；自己写入的行与内存一致，不会重复通知
+        if self._preload is not None and self._preload.is_alive():
+            return 0  # 后台载入的目录可能早于这些变更，载入完成后再同步
+        if self.writes_pending():
+            # 自己的修改还没有写入时，按数据库同步会覆盖内存中较新的数据；
+            # 在界面线程上等待写入可能卡住很久（其他进程占着写锁），下次再同步
+            return 0
+        rows = self.conn.execute(
+            'SELECT seq, tbl, key FROM changes WHERE seq > ? ORDER BY seq',
+            (self.change_seq,)).fetchall()
+        if not rows:
+            return 0
+        with metrics.timer('store.poll_changes', changes=len(rows)):
+            if rows[0][0] > self.change_seq + 1:
+                # 中间的日志已被清理，只能整体重新同步
+                self.change_seq = rows[-1][0]
+                self._resync()
+                return len(rows)
+            self.change_seq = rows[-1][0]
+            changed = {}
+            for _, table, key in rows:
+                changed.setdefault(table, {})[key] = None  # 保持顺序并去重
+            self._sync_users(changed.get('users', ()))
+            # 目录还没有载入时不用同步商品，之后载入的就是最新的数据
+            if self._catalog is not None or self._preload is not None:
+                self._sync_products(
+                    [int(id) for id in changed.get('products', ())])
+            self._sync_carts(changed.get('cart_items', ()))
+        metrics.count('store.changes', len(rows))
+        return len(rows)
+
+    def _sync_users(self, usernames):
+        for username in usernames:
+            row = self.conn.execute(
+                'SELECT password, role FROM users WHERE username = ?',
+                (username,)).fetchone()
+            user = self.users.get(username)
+            if row is None:
+                if user is not None:
+                    self._drop_user(user)
+            elif user is None:
+                user = (Admin if row[1] == 'admin' else User)(username, row[0])
+                self.users.add(user)
+                self._emit('insert', 'users', user, len(self.users) - 1)
+            else:
+                user.password = row[0]
+
+    def _sync_products(self, ids):
+        if ids and self.products and not self.conn.execute(
+                'SELECT 1 FROM products LIMIT 1').fetchone():
+            self._clear_loaded()  # 其他进程清空了商品，不必逐件删除
+            return
+        rows = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            for id, *row in self.conn.execute(
+                    'SELECT id, name, price, image_key, sku, key FROM products '
+                    f'WHERE id IN ({", ".join("?" * len(chunk))})', chunk):
+                rows[id] = row
+        for id in ids:
+            product = self.products.get(id)
+            row = rows.get(id)
+            if row is None:
+                if product is not None:
+                    self._drop_product(product)
+            elif product is None:
+                name, price, image_key, sku, _ = row
+                self._add_loaded(Product(name, price, image_key, id, sku))
+                self._emit('insert', 'products', self.products.get(id),
+                           self.products.position(id))
+            elif (product.name, product.price) != (row[0], row[1]):
+                self._set_product(product, row[0], row[1], row[4])
+
+    def _sync_carts(self, usernames):
+        # 已载入的购物车重新读取
+        for username in usernames:
+            user = self.users.get(username)
+            if user is not None and user.cart is not None:
+                self._unload_cart(user)
+                self.get_cart(user)
+
+    def _resync(self):
+        usernames = {user.username for user in self.users}
+        usernames.update(row[0] for row in self.conn.execute(
+            'SELECT username FROM users'))
+        self._sync_users(usernames)
+        for user in self.users:
+            user.cart = None
+        self.cart_owners.clear()
+        self._catalog = None
+        self._preloaded = None
+        self._emit('reload', 'products')
+
+    # 用户
+    # 变更通知：listener(event, table, item, position)，event 为 'insert'、
+    # 'delete'、'update' 或 'clear'，table 为 'users' 或 'products'，
+    # position 是 item 在 users / products 中的下标（delete 为删除前的下标）；
+    # 与其他进程的变更日志断开时发出 'reload'，需要重新读取 store.products
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+        return lambda: self.listeners.remove(listener)
+
+    def _emit(self, event, table, item=None, position=None):
+        for listener in self.listeners[:]:
+            listener(event, table, item, position)
+
+    def get_user(self, username):
+        return self.users.get(username)
+
+    def get_product(self, product_id):
+        return self.products.get(product_id)
+
+    def has_product(self, key):
+        return key in self.key_counts
+
+    def search_products(self, query='', min_price=None, max_price=None,
+                        page=0, page_size=PAGE_SIZE, sort=None):
+        total, ids = self.search_index.search(
+            query, min_price, max_price, page, page_size, sort)
+        return total, [self.products.get(id) for id in ids]
+
+    def add_user(self, user):
+        # 同步写入：其他进程可能刚刚注册了同名用户，写入成功才能返回注册成功
+        if user in self.users:
+            return False
+        self.flush()
+        try:
+            with self.conn:
+                self.conn.execute(
+                    'INSERT INTO users (username, password, role) '
+                    'VALUES (?, ?, ?)',
+                    (user.username, user.password, user.role))
+        except sqlite3.IntegrityError:
+            return False
+        self.users.add(user)
+        self._emit('insert', 'users', user, len(self.users) - 1)
+        return True
+
+    def delete_user(self, user):
+        self._write(('DELETE FROM users WHERE username = ?', (user.username,)))
+        self._drop_user(user)
+
+    def _drop_user(self, user):
+        self._unload_cart(user)
+        position = self.users.position(user.username)
+        self.users.remove(user)
+        self._emit('delete', 'users', user, position)
+
+    # 商品
+    def _insert_product(self, product):
+        self.ensure_catalog()  # 在插入之前载入，否则新行会被读入两次
+        key = product.key
+        cursor = self.conn.execute(
+            'INSERT INTO products (name, price, image_key, sku, key) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (product.name, product.price, product.image_key,
+             product.sku, key))
+        product.id = cursor.lastrowid
+
+    def _add_loaded(self, product):
+        self.products.add(product)
+        self.key_counts[product.key] = self.key_counts.get(product.key, 0) + 1
+        self.search_index.add(product)
+
+    def add_product(self, product):
+        return bool(self.add_products([product]))
+
+    def add_products(self, products):
+        # 跳过已经在商品列表中的商品，返回实际新增的商品；
+        # 商品的数据存入目录的列中，之后通过 store.products 读取
+        added = []
+        self.flush()  # 要用到自增 id，在本线程上同步写入
+        try:
+            with metrics.timer('store.add_products'), self.conn:
+                # 立即取得写锁，其他进程不能在检查重复和写入之间插入相同的商品
+                self.conn.execute('BEGIN IMMEDIATE')
+                for product in products:
+                    if product.key in self.key_counts or self.conn.execute(
+                            'SELECT 1 FROM products WHERE key = ?',
+                            (product.key,)).fetchone():
+                        continue  # 其他进程刚写入的，在 poll_changes 时载入
+                    self._insert_product(product)
+                    added.append(product)
+        except BaseException:
+            # 整批回滚，分配的 id 会被重新使用
+            for product in added:
+                product.id = None
+            raise
+        # 提交之后才载入目录，回滚时内存中不会留下数据库里没有的商品
+        for product in added:
+            self._add_loaded(product)
+        for position, product in enumerate(
+                added, len(self.products) - len(added)):
+            self._emit('insert', 'products', product, position)
+        return added
+
+    def update_product(self, product, name, price):
+        # 修改标题和价格；与其他商品重复时不修改，返回 False
+        key = product_key(name, price, product.sku)
+        if key != product.key and key in self.key_counts:
+            return False
+        self._write((
+            'UPDATE products SET name = ?, price = ?, key = ? WHERE id = ?',
+            (name, price, key, product.id)))
+        self._set_product(product, name, price, key)
+        return True
+
+    def _set_product(self, product, name, price, key):
+        self._forget_key(product.key)
+        self.search_index.remove(product)
+        for username in self.cart_owners.get(product.id, ()):
+            user = self.users.get(username)
+            user.cart_total += (price - product.price) * user.cart[product.id]
+        # 商品是目录中一行的视图，修改目录后随之更新
+        self.products.update(product.id, name, price)
+        product = self.products.get(product.id)
+        self.key_counts[key] = self.key_counts.get(key, 0) + 1
+        self.search_index.add(product)
+        self._emit('update', 'products', product,
+                   self.products.position(product.id))
+
+    def _forget_key(self, key):
+        if self.key_counts[key] > 1:
+            self.key_counts[key] -= 1
+        else:
+            del self.key_counts[key]
+
+    def delete_product(self, product):
+        self._write(('DELETE FROM products WHERE id = ?', (product.id,)))
+        product = self._drop_product(product)
+        # 删除可能还没有写入，查询时排除这件商品本身
+        if product.image_key is not None and not self.conn.execute(
+                'SELECT 1 FROM products WHERE image_key = ? AND id != ?',
+                (product.image_key, product.id)).fetchone():
+            image_store.discard(product.image_key)
+
+    def _drop_product(self, product):
+        # 先读出要用到的列，删除后视图不再可用
+        product = Product(product.name, product.price, product.image_key,
+                          product.id, product.sku)
+        position = self.products.position(product.id)
+        self.search_index.remove(product)
+        self.products.remove(product)
+        self._forget_key(product.key)
+        for username in self.cart_owners.pop(product.id, ()):
+            self.users.get(username).remove_from_cart(product)
+        self._emit('delete', 'products', product, position)
+        return product
+
+    def clear_products(self):
+        self._write(('DELETE FROM products', ()))
+        for key in {p.image_key for p in self.products if p.image_key}:
+            image_store.discard(key)
+        self._clear_loaded()
+
+    def _clear_loaded(self):
+        self.products.clear()
+        self.key_counts.clear()
+        self.search_index.clear()
+        for username in set().union(*self.cart_owners.values()):
+            self.users.get(username).clear_cart()
+        self.cart_owners.clear()
+        self._emit('clear', 'products')
+
+    # 购物车：每个用户的 商品 id -> 数量，登录后第一次用到时才读取该用户的条目，
+    # 总额随之算出一次，之后随增删商品更新
+    def get_cart(self, user):
+        if user.cart is None:
+            self.flush()
+            user.cart = dict(self.conn.execute(
+                'SELECT product_id, quantity FROM cart_items '
+                'WHERE username = ? ORDER BY id', (user.username,)))
+            user.cart_total = self.conn.execute(
+                'SELECT COALESCE(SUM(price * quantity), 0) FROM cart_items '
+                'JOIN products ON products.id = product_id '
+                'WHERE username = ?', (user.username,)).fetchone()[0]
+            for product_id in user.cart:
+                self.cart_owners.setdefault(product_id, set()).add(
+                    user.username)
+        return user.cart
+
+    def _forget_cart_items(self, user, product_ids=None):
+        for product_id in user.cart if product_ids is None else product_ids:
+            owners = self.cart_owners.get(product_id)
+            if owners is not None:
+                owners.discard(user.username)
+                if not owners:
+                    del self.cart_owners[product_id]
+
+    def _unload_cart(self, user):
+        # 购物车在下次用到时重新从数据库读取
+        if user.cart is not None:
+            self._forget_cart_items(user)
+            user.cart = None
+
+    def cart_items(self, user):
+        # [(商品, 数量)]
+        items = []
+        for product_id, quantity in self.get_cart(user).items():
+            product = self.get_product(product_id)
+            if product is not None:
+                items.append((product, quantity))
+        return items
+
+    def add_to_cart(self, user, product, quantity=1):
+        self.get_cart(user)
+        user.add_to_cart(product, quantity)  # 已删除商品的视图在这里抛出 KeyError
+        self._write(_cart_upsert(user.username, product.id, quantity))
+        self.cart_owners.setdefault(product.id, set()).add(user.username)
+
+    def remove_from_cart(self, user, product):
+        self.get_cart(user)
+        self._write((
+            'DELETE FROM cart_items WHERE username = ? AND product_id = ?',
+            (user.username, product.id)))
+        self._forget_cart_items(user, (product.id,))
+        user.remove_from_cart(product)
+
+    def clear_cart(self, user):
+        self._write((
+            'DELETE FROM cart_items WHERE username = ?', (user.username,)))
+        if user.cart is not None:
+            self._forget_cart_items(user)
+        user.clear_cart()
+
+    def checkout(self, user):
+        # 在一个事务中写入订单并清空购物车，返回订单总额（分）；
+        # 不论持久化模式，订单都在返回前同步提交。总额按数据库中的购物车和价格
+        # 在同一个事务中计算，其他进程刚刚修改的价格或删除的商品也算得对
+        self.get_cart(user)
+        self.flush()
+        with metrics.timer('store.checkout'), self.conn:
+            self.conn.execute('BEGIN IMMEDIATE')
+            order_id = self.conn.execute(
+                'INSERT INTO orders (username, created, total) '
+                'VALUES (?, ?, 0)', (user.username, time.time())).lastrowid
+            self.conn.execute(
+                'INSERT INTO order_items '
+                '(order_id, product_id, name, price, quantity) '
+                'SELECT ?, product_id, name, price, quantity FROM cart_items '
+                'JOIN products ON products.id = product_id '
+                'WHERE username = ? ORDER BY cart_items.id',
+                (order_id, user.username))
+            total = self.conn.execute(
+                'SELECT COALESCE(SUM(price * quantity), 0) FROM order_items '
+                'WHERE order_id = ?', (order_id,)).fetchone()[0]
+            self.conn.execute(
+                'UPDATE orders SET total = ? WHERE id = ?', (total, order_id))
+            self.conn.execute(
+                'DELETE FROM cart_items WHERE username = ?', (user.username,))
+        self._forget_cart_items(user)
+        user.clear_cart()
+        return total
+
+    # 订单
+    def orders(self, user):
+        # 该用户的历史订单，新的在前：[(订单号, 时间, 总额, [(标题, 单价, 数量)])]
+        self.flush()
+        items = {}
+        for order_id, name, price, quantity in self.conn.execute(
+                'SELECT order_id, name, price, quantity FROM order_items '
+                'JOIN orders ON orders.id = order_id WHERE username = ?',
+                (user.username,)):
+            items.setdefault(order_id, []).append((name, price, quantity))
+        return [(order_id, created, total, items.get(order_id, []))
+                for order_id, created, total in self.conn.execute(
+                    'SELECT id, created, total FROM orders '
+                    'WHERE username = ? ORDER BY id DESC', (user.username,))]
+
+    # 经常一起购买：由 recommend.rebuild 根据订单预先算好，每件商品一次主键查询
+    def co_purchases(self, product):
+        ids = [row[0] for row in self.conn.execute(
+            'SELECT neighbor_id FROM co_purchases WHERE product_id = ? '
+            'ORDER BY rank', (product.id,))]
+        return [p for p in map(self.products.get, ids) if p is not None]
+
+    def refresh_co_purchases(self):
+        # 有上次重建之后的新订单时，在单独的子进程中重建推荐表；
+        # 不占用缩略图的进程池，重建很慢时也不会让图片排队
+        if self._co_purchase_job is not None and \
+                not self._co_purchase_job.done():
+            return
+        latest, built = self.conn.execute(
+            'SELECT (SELECT MAX(id) FROM orders), '
+            '(SELECT MAX(last_order) FROM co_purchase_builds)').fetchone()
+        if latest is None or latest == built:
+            return
+        from recommend import rebuild
+
+        if self._co_purchase_executor is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            self._co_purchase_executor = ProcessPoolExecutor(
+                1, mp_context=multiprocessing.get_context('spawn'))
+        self._co_purchase_job = self._co_purchase_executor.submit(
+            rebuild, os.path.abspath(self.path))
+        self._co_purchase_job.add_done_callback(_co_purchases_built)
+
+    def unpriced_count(self):
+        # 迁移时因价格无法识别而没有导入的旧商品数
+        return self.conn.execute(
+            'SELECT COUNT(*) FROM unpriced_products').fetchone()[0]
+
+    def revenue(self, by_user=False):
+        # 在数据库中汇总订单数和营业额（分），不需要载入用户
+        self.flush()
+        if by_user:
+            return self.conn.execute(
+                'SELECT username, COUNT(*), SUM(total) FROM orders '
+                'GROUP BY username ORDER BY SUM(total) DESC').fetchall()
+        return self.conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(total), 0) FROM orders').fetchone()
+
+
+def _read_catalog(conn):
+    # 商品直接读入按列存放的目录，不为每件商品创建对象
+    products = Catalog()
+    key_counts = {}
+    rows = conn.execute(
+        'SELECT id, name, price, image_key, sku, key FROM products '
+        'ORDER BY id')
+    products.extend(_count_keys(rows, key_counts))
+    search_index = CatalogIndex(products)
+    search_index.add_all()
+    return products, key_counts, search_index
+
+
+def _count_keys(rows, key_counts):
+    for *row, key in rows:
+        key_counts[key] = key_counts.get(key, 0) + 1
+        yield row
+
+
+def _cart_upsert(username, product_id, quantity):
+    # 同一商品再次加入时合并数量；商品或用户已被其他进程删除时不写入
+    return ('INSERT INTO cart_items (username, product_id, quantity) '
+            'SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM products WHERE id = ?) '
+            'AND EXISTS (SELECT 1 FROM users WHERE username = ?) '
+            'ON CONFLICT (username, product_id) '
+            'DO UPDATE SET quantity = quantity + excluded.quantity',
+            (username, product_id, quantity, product_id, username))
+
+
+# 后台写入线程：使用单独的连接，把一段时间内提交的修改合并为一个事务，
+# 界面线程不再等待磁盘；flush() 等待已提交的修改全部写入
+class _Writer:
+    def __init__(self, path):
+        self.path = path
+        self.pending = []  # 每项是一次修改的语句
+        self.submitted = 0
+        self.written = 0
+        self.urgent = False
+        self.closed = False
+        self.error = None
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(
+            target=self._run, name='store-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, statements):
+        with self.cond:
+            if self.closed:
+                raise sqlite3.ProgrammingError('数据库已关闭')
+            self.pending.append(statements)
+            self.submitted += 1
+            self.cond.notify_all()
+
+    def busy(self):
+        with self.cond:
+            return self.written < self.submitted
+
+    def flush(self):
+        with self.cond:
+            target = self.submitted
+            self.urgent = True
+            self.cond.notify_all()
+            while self.written < target:
+                self.cond.wait()
+            error, self.error = self.error, None
+        if error is not None:
+            raise error
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            with self.cond:
+                self.closed = True
+                self.cond.notify_all()
+            self.thread.join()
+
+    def _run(self):
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT)
+        conn.execute('PRAGMA foreign_keys = ON')
+        try:
+            while True:
+                with self.cond:
+                    while not self.pending and not self.closed:
+                        self.cond.wait()
+                    if not self.pending:
+                        return
+                    # 第一次修改到达后再等一个窗口，期间的修改一起写入
+                    deadline = time.monotonic() + FLUSH_WINDOW
+                    while not (self.urgent or self.closed):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self.cond.wait(remaining)
+                    batch, self.pending = self.pending, []
+                    target = self.submitted
+                    self.urgent = False
+                with metrics.timer('store.flush', writes=len(batch)):
+                    error = self._write_batch(conn, batch)
+                metrics.count('store.writes', len(batch))
+                with self.cond:
+                    self.written = target
+                    if error is not None:
+                        self.error = error
+                    self.cond.notify_all()
+        finally:
+            conn.close()
+
+    def _write_batch(self, conn, batch):
+        # 每次修改放在一个保存点中，失败时只回滚这一次修改，
+        # 错误在下次 flush() 时于调用线程上抛出。内存中的数据已经更新，
+        # 其他进程占着写锁时不能马上丢掉整批修改，等锁释放后重试，
+        # 最多 WRITE_RETRIES 次
+        delay = WRITE_RETRY_DELAY
+        for attempt in range(WRITE_RETRIES + 1):
+            error = None
+            try:
+                with conn:
+                    conn.execute('BEGIN IMMEDIATE')
+                    for statements in batch:
+                        conn.execute('SAVEPOINT mutation')
+                        try:
+                            for sql, params in statements:
+                                conn.execute(sql, params)
+                        except sqlite3.Error as e:
+                            conn.execute('ROLLBACK TO mutation')
+                            metrics.count('store.flush_error')
+                            error = e
+                        conn.execute('RELEASE mutation')
+                return error
+            except sqlite3.OperationalError as e:
+                if not _is_busy(e) or attempt == WRITE_RETRIES:
+                    metrics.count('store.flush_error')
+                    return e
+                if conn.in_transaction:
+                    conn.rollback()
+                metrics.count('store.write_retry')
+                time.sleep(delay)
+                delay = min(delay * 2, WRITE_RETRY_MAX_DELAY)
+            except sqlite3.Error as e:
+                metrics.count('store.flush_error')
+                return e
+
+
+def _is_busy(error):
+    # 其他连接占着锁（SQLITE_BUSY / SQLITE_LOCKED），稍后重试即可
+    return 'locked' in str(error) or 'busy' in str(error)
+
+
+def _co_purchases_built(future):
+    # 在执行器的线程上调用；重建失败时旧的推荐表保持不变，记下错误
+    if future.cancelled():
+        return
+    error = future.exception()
+    if error is not None:
+        metrics.count('recommend.error')
+        traceback.print_exception(type(error), error, error.__traceback__)
+
+
+class _LegacyRecord:
+    # 旧版对象只需读出属性，现在的模型类使用 __slots__，不能直接还原
+    pass
+
+
+class _LegacyUnpickler(pickle.Unpickler):
+    # 旧版 data.pkl 里的类来自 __main__ (直接运行 main.py 时)
+    classes = ('Product', 'User', 'Admin')
+
+    def find_class(self, module, name):
+        if module in ('__main__', 'main') and name in self.classes:
+            return _LegacyRecord
+        return super().find_class(module, name)
+
+
+def migrate_pickle(store, path=LEGACY_PATH):
+    with open(path, 'rb') as f:
+        users, products = _LegacyUnpickler(f).load()
+    store.flush()
+
+    # pickle 会保留同一对象的引用，购物车中的商品和商品列表中的是同一个对象
+    migrated = {}
+    with store.conn:
+        for product in products:
+            legacy_id = id(product)
+            image = product.__dict__.get('image')
+            try:
+                price = parse_price(product.price)
+            except ValueError:
+                # 价格无法识别的商品不导入，购物车中的也随之去掉
+                store.conn.execute(
+                    'INSERT INTO unpriced_products '
+                    '(name, price, image_key) VALUES (?, ?, ?)',
+                    (product.name, str(product.price),
+                     image_store.put(image) if image else None))
+                metrics.count('store.unpriced_products')
+                continue
+            # 旧版的去重没有生效，重复的商品合并为同一个
+            row = store.conn.execute(
+                'SELECT id FROM products WHERE key = ? ORDER BY id LIMIT 1',
+                (product_key(product.name, price),)).fetchone()
+            if row:
+                migrated[legacy_id] = store.get_product(row[0])
+                continue
+            product = Product(product.name, price,
+                              image_store.put(image) if image else None)
+            store._insert_product(product)
+            store._add_loaded(product)
+            migrated[legacy_id] = store.get_product(product.id)
+
+        for legacy in users:
+            user = (Admin if legacy.role == 'admin' else User)(
+                legacy.username, legacy.password)
+            if store.get_user(user.username) is None:
+                store.conn.execute(
+                    'INSERT INTO users (username, password, role) '
+                    'VALUES (?, ?, ?)',
+                    (user.username, user.password, user.role))
+                store.users.add(user)
+            for item in legacy.cart:
+                # 已被删除的商品不再保留在购物车中
+                if id(item) in migrated:
+                    store.conn.execute(*_cart_upsert(
+                        user.username, migrated[id(item)].id, 1))
+            store._unload_cart(store.get_user(user.username))
+
+
+def open_store(path=DB_PATH, legacy_path=LEGACY_PATH):
+    store = Store(path)
+    if not store.users:
+        if os.path.exists(legacy_path):
+            migrate_pickle(store, legacy_path)
+            os.replace(legacy_path, legacy_path + '.migrated')
+        if store.get_user("admin") is None:
+            store.add_user(User("admin", "admin"))
+    return store
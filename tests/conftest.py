@@ -0,0 +1,14 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    # 数据库、缩略图目录和缓存都是相对路径，每个测试在自己的临时目录中运行
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr('metrics.metrics.path', None)
+    return tmp_path
@@ -0,0 +1,15 @@
+import json
+
+from importer import CHECKPOINT_PATH, main
+
+
+def test_rerun_finished_import(capsys):
+    # 检查点中已有全部关键字时不发请求，也不载入商品目录
+    with open('k.txt', 'w', encoding='utf-8') as f:
+        f.write('手机\n# 注释\n耳机\n')
+    with open(CHECKPOINT_PATH, 'w', encoding='utf-8') as f:
+        json.dump({'done': ['手机', '耳机']}, f)
+    assert main(['import', '--keywords-file', 'k.txt']) == 0
+    output = capsys.readouterr().out
+    assert '已完成 2 个' in output
+    assert '商品总数 0' in output
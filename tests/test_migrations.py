@@ -0,0 +1,153 @@
+import sqlite3
+from io import BytesIO
+
+from PIL import Image
+
+from images import image_store
+from store import open_store
+
+# 最早（把 data.pkl 换成 SQLite 时）的表结构：图片存在 images 表中，
+# 价格是字符串，购物车每件商品一行
+V1_SCHEMA = """
+CREATE TABLE users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL,
+    role TEXT NOT NULL DEFAULT 'user'
+);
+CREATE TABLE images (
+    key TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+CREATE TABLE products (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    price TEXT NOT NULL,
+    image_key TEXT REFERENCES images(key)
+);
+CREATE TABLE cart (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL REFERENCES users(username) ON DELETE CASCADE,
+    product_id INTEGER NOT NULL REFERENCES products(id) ON DELETE CASCADE
+);
+CREATE INDEX cart_username ON cart(username);
+"""
+
+
+def png(color):
+    buffer = BytesIO()
+    Image.new('RGB', (40, 30), color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def make_v1_db(path):
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA foreign_keys = ON')
+    conn.executescript(V1_SCHEMA)
+    with conn:
+        conn.executemany('INSERT INTO users VALUES (?, ?, ?)', [
+            ('admin', 'admin', 'admin'), ('bob', 'pw', 'user')])
+        conn.executemany('INSERT INTO images VALUES (?, ?)', [
+            ('a' * 40, png('red')), ('b' * 40, png('blue'))])
+        conn.executemany(
+            'INSERT INTO products (name, price, image_key) VALUES (?, ?, ?)', [
+                ('手机 A', '1,299.00', 'a' * 40),
+                ('耳机 B', '99.5', 'b' * 40),
+                ('数据线 C', '￥１２.３４５', None)])
+        conn.executemany(
+            'INSERT INTO cart (username, product_id) VALUES (?, ?)',
+            [('bob', 1), ('bob', 2), ('bob', 1)])
+    conn.close()
+
+
+def test_upgrade_v1_database_with_images():
+    make_v1_db('data.db')
+    store = open_store('data.db')
+    try:
+        products = [(p.name, p.price, p.image_key) for p in store.products]
+        assert products == [('手机 A', 129900, 'a' * 40),
+                            ('耳机 B', 9950, 'b' * 40),
+                            ('数据线 C', 1235, None)]
+        assert image_store.exists('a' * 40) and image_store.exists('b' * 40)
+        assert store.get_product(1).image.size == (40, 30)
+
+        tables = {row[0] for row in store.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert 'images' not in tables and 'cart' not in tables
+        sql = store.conn.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'products'"
+        ).fetchone()[0]
+        assert 'REFERENCES' not in sql
+        assert store.conn.execute('PRAGMA foreign_key_check').fetchall() == []
+
+        bob = store.get_user('bob')
+        assert store.get_cart(bob) == {1: 2, 2: 1}
+        assert bob.cart_total == 2 * 129900 + 9950
+        assert store.checkout(bob) == 2 * 129900 + 9950
+    finally:
+        store.close()
+
+    # 再次打开不会重复迁移
+    store = open_store('data.db')
+    try:
+        assert [p.price for p in store.products] == [129900, 9950, 1235]
+    finally:
+        store.close()
+
+
+# 价格改为整数分之前的表结构：价格是字符串，购物车已经合并为带数量的条目
+TEXT_PRICE_SCHEMA = """
+CREATE TABLE users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL,
+    role TEXT NOT NULL DEFAULT 'user'
+);
+CREATE TABLE products (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    price TEXT NOT NULL,
+    image_key TEXT,
+    sku TEXT,
+    key TEXT
+);
+CREATE TABLE cart_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL REFERENCES users(username) ON DELETE CASCADE,
+    product_id INTEGER NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+    quantity INTEGER NOT NULL DEFAULT 1,
+    UNIQUE (username, product_id)
+);
+"""
+
+
+def test_upgrade_text_prices_with_cart():
+    conn = sqlite3.connect('data.db')
+    conn.executescript(TEXT_PRICE_SCHEMA)
+    with conn:
+        conn.executemany('INSERT INTO users VALUES (?, ?, ?)', [
+            ('admin', 'admin', 'admin'), ('bob', 'pw', 'user')])
+        conn.executemany(
+            'INSERT INTO products (name, price, sku, key) VALUES (?, ?, ?, ?)',
+            [('手机', '1.005', '100', 'sku:100'),
+             ('耳机', '面议', None, 't:耳机|面议'),
+             ('充电器', '１２.３４５', None, 't:充电器|12.345')])
+        conn.executemany(
+            'INSERT INTO cart_items (username, product_id, quantity) '
+            'VALUES (?, ?, ?)', [('bob', 1, 2), ('bob', 2, 1), ('bob', 3, 1)])
+    conn.close()
+
+    store = open_store('data.db')
+    try:
+        assert [(p.id, p.name, p.price) for p in store.products] == [
+            (1, '手机', 101), (3, '充电器', 1235)]
+        assert store.get_product(3).key == 't:充电器|12.35'
+        # 价格无法识别的商品不会以 0 元出售，留给管理员核对
+        assert store.conn.execute(
+            'SELECT old_id, name, price FROM unpriced_products').fetchall() \
+            == [(2, '耳机', '面议')]
+        assert store.unpriced_count() == 1
+        assert store.conn.execute('PRAGMA foreign_key_check').fetchall() == []
+        bob = store.get_user('bob')
+        assert store.get_cart(bob) == {1: 2, 3: 1}
+        assert store.checkout(bob) == 2 * 101 + 1235
+    finally:
+        store.close()
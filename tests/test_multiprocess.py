@@ -0,0 +1,8 @@
+from benchmarks.stress_multiprocess import run
+
+
+def test_processes_share_one_store():
+    # 几个进程同时读写同一个数据库，最后各自同步后与数据库一致
+    checks, reports, _ = run(processes=3, operations=60)
+    assert checks == dict.fromkeys(checks, True)
+    assert len(reports) == 3
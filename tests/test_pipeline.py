@@ -0,0 +1,20 @@
+import pytest
+
+from pipeline import product_from_item
+
+
+def test_product_from_item():
+    product = product_from_item(
+        {'ad_title_text': '手机', 'price': '1,299.00', 'sku_id': '100'})
+    assert (product.name, product.price, product.sku) == ('手机', 129900, '100')
+
+
+@pytest.mark.parametrize('item', [
+    {'price': '1.00'},
+    {'ad_title_text': None, 'price': '1.00'},
+    {'ad_title_text': '  ', 'price': '1.00'},
+    {'ad_title_text': '手机', 'price': '面议'},
+])
+def test_product_from_item_rejects(item):
+    with pytest.raises(ValueError):
+        product_from_item(item)
@@ -0,0 +1,34 @@
+import pytest
+
+from models import format_price, parse_price, product_key
+
+
+@pytest.mark.parametrize('value, cents', [
+    ('1.005', 101),
+    (1.005, 101),
+    ('12.345', 1235),
+    (12.345, 1235),
+    ('1,299.00', 129900),
+    ('￥ 99.5 元', 9950),
+    ('１２.３４', 1234),
+    ('０.００５', 1),
+    (0, 0),
+    (7, 700),
+])
+def test_parse_price(value, cents):
+    assert parse_price(value) == cents
+
+
+@pytest.mark.parametrize('value', [
+    '-1', -0.01, 'nan', float('nan'), 'inf', float('inf'), '', '面议', None,
+])
+def test_parse_price_rejects(value):
+    with pytest.raises(ValueError):
+        parse_price(value)
+    assert parse_price(value, default=-1) == -1
+
+
+def test_format_price():
+    assert format_price(101) == '1.01'
+    assert format_price(129900) == '1299.00'
+    assert product_key('  手机　壳 ', 1235) == 't:手机 壳|12.35'
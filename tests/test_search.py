@@ -0,0 +1,30 @@
+from catalog import Catalog
+from search import CatalogIndex, tokenize
+
+
+def make_index(names):
+    catalog = Catalog()
+    catalog.extend((id, name, 100 * id, None, None)
+                   for id, name in enumerate(names, 1))
+    index = CatalogIndex(catalog)
+    index.add_all()
+    return catalog, index
+
+
+def test_tokenize():
+    assert tokenize('男士 双肩包 USB３.0') == ['男士', '双肩', '肩包', 'usb3.0']
+    assert tokenize('双肩包', unigrams=True) == [
+        '双肩', '肩包', '双', '肩', '包']
+
+
+def test_single_character_query_matches_inside_longer_words():
+    catalog, index = make_index(['男士双肩包', '女士手提包', '男鞋', '数据线'])
+    assert index.search('包') == (2, [1, 2])
+    assert index.search('男') == (2, [1, 3])
+    assert index.search('双肩包') == (1, [1])
+    # 删除后单字的倒排也随之去掉
+    product = catalog.get(1)
+    index.remove(product)
+    catalog.remove(product)
+    assert index.search('包') == (1, [2])
+    assert '双' not in index.postings
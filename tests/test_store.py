@@ -0,0 +1,123 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import store as store_module
+from models import Product, User
+from store import Store
+
+
+def test_batched_writes_wait_for_other_writers(monkeypatch):
+    monkeypatch.setattr(store_module, 'BUSY_TIMEOUT', 0.05)
+    store = Store('data.db')
+    store.add_products([Product('手机', 100)])
+    product = store.products[0]
+    # 另一个进程占着写锁，超过 BUSY_TIMEOUT 后才释放
+    other = sqlite3.connect('data.db', isolation_level=None,
+                            check_same_thread=False)
+    other.execute('BEGIN IMMEDIATE')
+    released = threading.Timer(0.5, other.execute, ('COMMIT',))
+    released.start()
+    start = time.monotonic()
+    store.update_product(product, '手机', 200)
+    store.flush()
+    released.join()
+    other.close()
+    assert time.monotonic() - start >= 0.4
+    assert store.conn.execute(
+        'SELECT name, price FROM products').fetchall() == [('手机', 200)]
+    store.close()
+
+
+def test_add_user_fails_when_another_process_took_the_name():
+    first = Store('data.db')
+    second = Store('data.db')
+    assert first.add_user(User('bob', 'x'))
+    assert not second.add_user(User('bob', 'y'))
+    second.poll_changes()
+    assert [user.password for user in second.users] == ['x']
+    first.close()
+    second.close()
+
+
+def test_price_changes_and_deletes_update_loaded_carts():
+    store = Store('data.db', durability='immediate')
+    for name in ('alice', 'bob', 'carol'):
+        store.add_user(User(name, 'x'))
+    store.add_products([Product('手机', 1000), Product('耳机', 200)])
+    phone, earphones = store.products[0], store.products[1]
+    alice, bob, carol = (store.get_user(name)
+                         for name in ('alice', 'bob', 'carol'))
+    store.add_to_cart(alice, phone, 2)
+    store.add_to_cart(alice, earphones)
+    store.add_to_cart(bob, earphones, 3)
+    store.remove_from_cart(bob, earphones)
+    assert carol.cart is None
+
+    store.update_product(phone, '手机', 1500)
+    store.update_product(earphones, '耳机', 100)
+    assert alice.cart_total == 2 * 1500 + 100
+    assert bob.cart_total == 0
+
+    store.delete_product(phone)
+    assert alice.cart == {earphones.id: 1} and alice.cart_total == 100
+    assert store.cart_owners == {earphones.id: {'alice'}}
+    assert store.get_cart(carol) == {}
+
+    assert store.checkout(alice) == 100
+    assert store.cart_owners == {}
+    store.close()
+
+
+def test_failed_batch_leaves_catalog_unchanged():
+    store = Store('data.db')
+    store.ensure_catalog()
+    with pytest.raises(sqlite3.IntegrityError):
+        store.add_products([Product('手机', 100), Product(None, 200)])
+    assert len(store.products) == 0 and not store.key_counts
+    assert store.search_products('手机') == (0, [])
+    # 回滚之后仍然可以正常新增
+    assert [p.name for p in store.add_products([Product('耳机', 500)])] == [
+        '耳机']
+    assert store.conn.execute(
+        'SELECT id, name FROM products').fetchall() == [(1, '耳机')]
+    assert [(p.id, p.name) for p in store.products] == [(1, '耳机')]
+    store.close()
+
+
+def test_add_deleted_product_to_cart_leaves_cart_unchanged():
+    store = Store('data.db')
+    store.add_user(User('bob', 'x'))
+    store.add_products([Product('手机', 100), Product('耳机', 200)])
+    bob = store.get_user('bob')
+    phone, earphones = store.products[0], store.products[1]
+    store.add_to_cart(bob, phone)
+    store.delete_product(earphones)
+    with pytest.raises(KeyError):
+        store.add_to_cart(bob, earphones)
+    store.flush()
+    assert bob.cart == {phone.id: 1} and bob.cart_total == 100
+    assert store.cart_owners == {phone.id: {'bob'}}
+    store.close()
+
+
+def test_poll_changes_does_not_wait_for_blocked_writes(monkeypatch):
+    monkeypatch.setattr(store_module, 'BUSY_TIMEOUT', 0.05)
+    monkeypatch.setattr(store_module, 'WRITE_RETRIES', 1)
+    store = Store('data.db')
+    store.add_products([Product('手机', 100)])
+    other = sqlite3.connect('data.db', isolation_level=None)
+    other.execute('BEGIN IMMEDIATE')
+    store.update_product(store.products[0], '手机', 200)
+    start = time.monotonic()
+    assert store.poll_changes() == 0
+    assert time.monotonic() - start < 0.05
+    # 重试次数用完后放弃这一批，错误在 flush() 时抛出
+    with pytest.raises(sqlite3.OperationalError):
+        store.flush()
+    other.execute('ROLLBACK')
+    other.close()
+    assert not store.writes_pending()
+    store.close()
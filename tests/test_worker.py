@@ -0,0 +1,32 @@
+from metrics import metrics
+from worker import AsyncWorker
+
+
+class FakeWidget:
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, delay, callback, *args):
+        self.scheduled.append((callback, args))
+
+
+def test_poll_keeps_running_after_callback_error(capsys):
+    worker = AsyncWorker()
+    widget = FakeWidget()
+    calls = []
+
+    def fail():
+        raise RuntimeError('boom')
+
+    worker.call_in_ui(calls.append, 1)
+    worker.call_in_ui(fail)
+    worker.call_in_ui(calls.append, 2)
+    errors = metrics.counters['worker.callback_error']
+    try:
+        worker.poll(widget)
+    finally:
+        worker.stop()
+    assert calls == [1, 2]
+    assert metrics.counters['worker.callback_error'] == errors + 1
+    assert 'boom' in capsys.readouterr().err
+    assert widget.scheduled == [(worker.poll, (widget,))]
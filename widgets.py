@@ -0,0 +1,256 @@
+import tkinter as tk
+from tkinter import ttk
+
+from images import THUMBNAIL_WIDTH
+from models import format_price, parse_price
+from search import PAGE_SIZE
+
+ROW_HEIGHT = 130  # 每行固定高度，便于直接由滚动位置算出可见行
+BUFFER_ROWS = 3  # 可见区域上下额外渲染的行数
+THUMBNAIL_BOX = (THUMBNAIL_WIDTH, ROW_HEIGHT - 30)  # 每行缩略图的显示区域
+SORT_ORDERS = {"默认排序": None, "价格从低到高": "price", "价格从高到低": "-price"}
+
+
+def fit_thumbnail(image, size=THUMBNAIL_BOX):
+    # 把缩略图居中放到固定大小的白底图片上，行控件的 PhotoImage 可以原地 paste
+    from PIL import Image
+
+    box = Image.new('RGB', size, 'white')
+    if image is not None:
+        if image.width > size[0] or image.height > size[1]:
+            image = image.copy()
+            image.thumbnail(size)
+        offset = ((size[0] - image.width) // 2,
+                  (size[1] - image.height) // 2)
+        box.paste(image, offset, image if image.mode == 'RGBA' else None)
+    return box
+
+
+class ProductRow(tk.Frame):
+    def __init__(self, master, on_click, font):
+        super().__init__(master, borderwidth=2, relief="groove", bg="white")
+        self.index = None
+        self.window = None
+        self.photo = None
+
+        self.image_label = tk.Label(self)
+        self.image_label.grid(row=0, column=0, padx=10, pady=10)
+        self.name_label = tk.Label(self, wraplength=620, font=font,
+                                   justify="left")
+        self.name_label.grid(row=0, column=1, sticky='w', columnspan=2)
+        self.price_label = tk.Label(self, font=font)
+        self.price_label.grid(row=0, column=3, sticky='e', padx=10)
+        self.grid_columnconfigure(1, weight=1)
+
+        for widget in (self, self.image_label, self.name_label,
+                       self.price_label):
+            widget.bind("<Button-1>", lambda event: on_click(self.index))
+
+    def show(self, index, product, selected):
+        if index != self.index:
+            self.index = index
+            self.name_label.config(text=product.name)
+            self.price_label.config(
+                text=f"价格: ¥{format_price(product.price)}")
+            # 每行只有一个固定大小的 PhotoImage，换行内容时原地更新像素，
+            # 屏幕上的图片内存只与可见行数有关
+            if self.photo is None:
+                from PIL import ImageTk
+
+                width, height = THUMBNAIL_BOX
+                self.photo = ImageTk.PhotoImage(
+                    'RGB', THUMBNAIL_BOX, width=width, height=height)
+                self.image_label.config(image=self.photo)
+            self.photo.paste(fit_thumbnail(product.image))
+        self.config(bg="lightblue" if selected else "white")
+
+
+# 只为可见行（加上少量缓冲）创建控件的商品列表，滚动时复用行控件
+class VirtualProductList(tk.Frame):
+    def __init__(self, master=None, on_select=None, font=None):
+        super().__init__(master)
+        self.items = []
+        self.selected_index = None
+        self.on_select = on_select
+        self.font = font
+        self.rows: list[ProductRow] = []
+
+        self.canvas = tk.Canvas(self, highlightthickness=0)
+        self.scrollbar = ttk.Scrollbar(
+            self, orient="vertical", command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=self.on_yscroll)
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.canvas.bind("<Configure>", self.on_configure)
+
+    def set_items(self, items):
+        self.items = items
+        self.selected_index = None
+        for row in self.rows:
+            row.index = None
+        self.update_scrollregion()
+        self.canvas.yview_moveto(0)
+        self.render()
+
+    def refresh(self, selected_index=None):
+        # items 在原处增删改之后重新绘制，保持滚动位置
+        self.selected_index = selected_index
+        for row in self.rows:
+            row.index = None
+        self.update_scrollregion()
+        self.render()
+
+    def update_scrollregion(self):
+        self.canvas.configure(
+            scrollregion=(0, 0, self.canvas.winfo_width(),
+                          len(self.items) * ROW_HEIGHT),
+            yscrollincrement=ROW_HEIGHT // 4)
+
+    def on_configure(self, event):
+        self.update_scrollregion()
+        self.render()
+
+    def selected(self):
+        if self.selected_index is None:
+            return None
+        return self.items[self.selected_index]
+
+    def select(self, index):
+        if index is None or index >= len(self.items):
+            return
+        self.selected_index = index
+        self.render()
+        if self.on_select is not None:
+            self.on_select(self.items[index])
+
+    def see(self, index):
+        # 把第 index 行滚动到顶部
+        if self.items:
+            self.canvas.yview_moveto(index / len(self.items))
+
+    def scroll(self, units):
+        self.canvas.yview_scroll(units, "units")
+
+    def on_yscroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.render()
+
+    def render(self):
+        width = self.canvas.winfo_width()
+        height = self.canvas.winfo_height()
+        top = int(self.canvas.canvasy(0))
+        first = max(0, top // ROW_HEIGHT - BUFFER_ROWS)
+        last = min(len(self.items),
+                   (top + height) // ROW_HEIGHT + 1 + BUFFER_ROWS)
+        visible = range(first, last)
+
+        while len(self.rows) < len(visible):
+            row = ProductRow(self.canvas, self.select, self.font)
+            row.window = self.canvas.create_window(
+                0, 0, window=row, anchor="nw", state="hidden")
+            self.rows.append(row)
+
+        # 仍在可见范围内的行保持不动，其余的行重新绑定到新出现的下标
+        placed = {row.index: row for row in self.rows if row.index in visible}
+        free = [row for row in self.rows if row.index not in visible]
+        for index in visible:
+            row = placed.get(index)
+            if row is None:
+                row = free.pop()
+            row.show(index, self.items[index], index == self.selected_index)
+            self.canvas.itemconfigure(
+                row.window, state="normal", width=max(width - 20, 1),
+                height=ROW_HEIGHT - 10)
+            self.canvas.coords(row.window, 10, index * ROW_HEIGHT + 5)
+        for row in free:
+            row.index = None
+            self.canvas.itemconfigure(row.window, state="hidden")
+
+
+# 商品搜索栏：关键字、价格区间、排序和翻页；
+# on_search(query, min_price, max_price, page, sort) 返回匹配的商品总数，
+# 价格单位为分，sort 见 SORT_ORDERS
+class SearchBar(tk.Frame):
+    def __init__(self, master, on_search, page_size=PAGE_SIZE, font=None):
+        super().__init__(master)
+        self.on_search = on_search
+        self.page_size = page_size
+        self.page = 0
+        self.total = 0
+
+        self.query_entry = tk.Entry(self, width=20, font=font)
+        self.query_entry.pack(side="left", padx=5)
+        self.query_entry.bind("<Return>", lambda event: self.search())
+        tk.Label(self, text="价格：").pack(side="left")
+        self.min_entry = tk.Entry(self, width=8, font=font)
+        self.min_entry.pack(side="left")
+        tk.Label(self, text="-").pack(side="left")
+        self.max_entry = tk.Entry(self, width=8, font=font)
+        self.max_entry.pack(side="left")
+        for entry in (self.min_entry, self.max_entry):
+            entry.bind("<Return>", lambda event: self.search())
+        self.sort_box = ttk.Combobox(
+            self, values=list(SORT_ORDERS), state="readonly", width=12)
+        self.sort_box.current(0)
+        self.sort_box.pack(side="left", padx=5)
+        self.sort_box.bind("<<ComboboxSelected>>", lambda event: self.search())
+
+        tk.Button(self, text="查找", command=self.search).pack(
+            side="left", padx=5)
+        self.prev_button = tk.Button(
+            self, text="上一页", command=lambda: self.turn(-1))
+        self.prev_button.pack(side="left")
+        self.next_button = tk.Button(
+            self, text="下一页", command=lambda: self.turn(1))
+        self.next_button.pack(side="left")
+        self.status = tk.Label(self)
+        self.status.pack(side="left", padx=5)
+
+    def filters(self):
+        query = self.query_entry.get().strip()
+        prices = []
+        for entry in (self.min_entry, self.max_entry):
+            text = entry.get().strip()
+            if not text:
+                prices.append(None)
+                continue
+            prices.append(parse_price(text))
+        return query, prices[0], prices[1], SORT_ORDERS[self.sort_box.get()]
+
+    def active(self):
+        try:
+            return any(value is not None and value != ""
+                       for value in self.filters())
+        except ValueError:
+            return False
+
+    def search(self):
+        self.page = 0
+        self.run()
+
+    def turn(self, step):
+        self.page += step
+        self.run()
+
+    def run(self):
+        try:
+            query, min_price, max_price, sort = self.filters()
+        except ValueError as e:
+            self.status.config(text=str(e))
+            return
+        self.show_total(
+            self.on_search(query, min_price, max_price, self.page, sort))
+
+    def show_total(self, total):
+        self.total = total
+        if not self.active():
+            pages = 1
+            self.status.config(text=f"共 {self.total} 件")
+        else:
+            pages = max(1, -(-self.total // self.page_size))
+            self.status.config(
+                text=f"第 {self.page + 1}/{pages} 页，共 {self.total} 件")
+        self.prev_button.config(
+            state="normal" if self.page > 0 else "disabled")
+        self.next_button.config(
+            state="normal" if self.page + 1 < pages else "disabled")
@@ -0,0 +1,63 @@
+import asyncio
+import queue
+import threading
+import traceback
+
+from metrics import metrics
+
+POLL_INTERVAL = 50  # 毫秒，Tk 主循环检查回调队列的间隔
+
+
+# 在后台线程上运行的事件循环，Tk 线程通过 submit 提交协程，
+# 协程通过 call_in_ui 把回调放进队列，由 Tk 线程用 after() 取出执行
+class AsyncWorker:
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.callbacks = queue.Queue()
+        self.thread = threading.Thread(
+            target=self._run, name='async-worker', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call_in_ui(self, callback, *args):
+        self.callbacks.put((callback, args))
+
+    def poll(self, widget):
+        # 一个回调出错不能影响后面的回调，也不能让轮询停下来
+        try:
+            while True:
+                try:
+                    callback, args = self.callbacks.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    callback(*args)
+                except Exception:
+                    metrics.count('worker.callback_error')
+                    traceback.print_exc()
+        finally:
+            widget.after(POLL_INTERVAL, self.poll, widget)
+
+    def stop(self, shutdown=None, timeout=5):
+        async def stop():
+            tasks = [task for task in asyncio.all_tasks()
+                     if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if shutdown is not None:
+                await shutdown()
+
+        if self.loop.is_running():
+            try:
+                self.submit(stop()).result(timeout)
+            except Exception:
+                pass
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout)